@@ -0,0 +1,513 @@
+# Precomputed aggregates used by the dashboard callbacks
+#
+# These are built once per dataset version (see data_store.fingerprint_cached)
+# so that callbacks only slice arrays instead of re-running pandas groupbys.
+# Catalog aggregates come either from the whole catalog frame or from running
+# totals: updated with appended rows only (CATALOG_INGESTION=append), or
+# computed out of core from streamed chunks (CATALOG_INGESTION=stream). See
+# ingest.py.
+
+import os
+import copy
+import hashlib
+import logging
+import functools
+import threading
+
+import numpy as np
+import pandas as pd
+
+from data_store import (
+    load_dataset, fingerprint_cached, iter_dataset_chunks, source_path, dataset_fingerprints,
+)
+from ingest import (
+    CATALOG_COLUMNS, CATALOG_DTYPES, CATALOG_INGESTION, STREAM_TITLE_LIMIT, CatalogIngestor, CatalogTotals,
+)
+from search_index import SEARCH_KINDS, load_or_build
+
+logger = logging.getLogger(__name__)
+
+
+# Genre -> artist popularity sums, laid out for prefix slicing.
+#
+# Built from per-(genre, artist) popularity sums (see artist_popularity).
+# Genres are stored in descending order of total popularity, so the top
+# `genre_limit` genres are always genres[:genre_limit]. Artist rows are stored
+# contiguously per genre in the same order, with offsets[i]:offsets[i + 1]
+# being the artists of genres[i]. Within a genre, artists are sorted by
+# descending popularity. Ties are broken by name in both cases.
+#
+# The top k artists of a genre are therefore the first k of its run, and the
+# popularity of the rest is the genre total minus a prefix sum, so a sunburst
+# limited to k artists per genre costs O(genres * k) whatever the catalog size.
+class GenreArtistCube:
+    def __init__(self, artist_totals):
+        genre_totals = (
+            artist_totals.groupby('genre')['popularity'].sum()
+            .sort_values(ascending=False, kind='stable')
+        )
+        self.genres = genre_totals.index.to_numpy(dtype=object)
+        self.genre_values = genre_totals.to_numpy()
+        self.genre_rank = {genre: rank for rank, genre in enumerate(self.genres)}
+
+        artist_totals = artist_totals.assign(rank=artist_totals['genre'].map(self.genre_rank))
+        artist_totals = artist_totals.sort_values(
+            ['rank', 'popularity', 'artists'], ascending=[True, False, True], kind='stable'
+        )
+        self.artists = artist_totals['artists'].to_numpy(dtype=object)
+        self.artist_genres = artist_totals['genre'].to_numpy(dtype=object)
+        self.artist_values = artist_totals['popularity'].to_numpy()
+        self.artist_cumsum = np.concatenate([[0], np.cumsum(self.artist_values)])
+        # Sunburst ids: the genre name for genres, genre/artist for artists
+        self.artist_ids = self.artist_genres + '/' + self.artists
+
+        counts = np.bincount(artist_totals['rank'].to_numpy(), minlength=len(self.genres))
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    # Range of genre ranks shown for a dropdown/slider combination
+    def genre_slice(self, selected_genre, genre_limit):
+        genre_limit = max(0, min(int(genre_limit or 0), len(self.genres)))
+        if selected_genre and selected_genre != "All":
+            rank = self.genre_rank.get(selected_genre)
+            # A genre outside the top `genre_limit` is filtered out entirely
+            if rank is None or rank >= genre_limit:
+                return slice(0, 0)
+            return slice(rank, rank + 1)
+        return slice(0, genre_limit)
+
+    # Sunburst ids/labels/parents/values for the selected genre and genre
+    # limit. Each genre shows its `top_artists` most popular artists and an
+    # "Other" node summing the rest; `expanded_genre` shows up to
+    # `expanded_artists` of them instead.
+    def sunburst_data(self, selected_genre, genre_limit, top_artists, expanded_genre=None, expanded_artists=None):
+        genres = self.genre_slice(selected_genre, genre_limit)
+        ranks = np.arange(genres.start, genres.stop)
+        starts = self.offsets[ranks]
+        counts = self.offsets[ranks + 1] - starts
+        shown = np.minimum(counts, top_artists)
+        expanded = self.genre_rank.get(expanded_genre, -1)
+        if genres.start <= expanded < genres.stop:
+            shown[expanded - genres.start] = min(counts[expanded - genres.start], expanded_artists or counts.max())
+
+        # Positions of the shown artists: the first `shown` of each genre's run
+        artists = np.arange(shown.sum()) + np.repeat(starts - (np.cumsum(shown) - shown), shown)
+
+        # "Other" nodes for genres with hidden artists
+        hidden = counts - shown
+        other = hidden > 0
+        other_genres = self.genres[ranks[other]]
+        other_values = (
+            self.genre_values[ranks[other]]
+            - (self.artist_cumsum[starts[other] + shown[other]] - self.artist_cumsum[starts[other]])
+        )
+
+        ids = np.concatenate([self.genres[genres], self.artist_ids[artists], other_genres + '//other'])
+        labels = np.concatenate([
+            self.genres[genres], self.artists[artists],
+            np.array([f"Other ({count} artists)" for count in hidden[other]], dtype=object),
+        ])
+        parents = np.concatenate([
+            np.full(len(ranks), '', dtype=object), self.artist_genres[artists], other_genres,
+        ])
+        values = np.concatenate([self.genre_values[genres], self.artist_values[artists], other_values])
+        return ids, labels, parents, values
+
+
+_ingestor = None
+_ingestor_lock = threading.Lock()
+
+
+# The catalog ingestor (append mode), brought up to date with the file
+def catalog_ingestor():
+    global _ingestor
+    with _ingestor_lock:
+        if _ingestor is None:
+            _ingestor = CatalogIngestor(source_path('spotify_dataset'))
+    _ingestor.refresh()
+    return _ingestor
+
+
+# Catalog totals computed chunk by chunk from the streamed source (stream mode)
+@fingerprint_cached('spotify_dataset')
+def streamed_catalog_totals():
+    totals = CatalogTotals(title_limit=STREAM_TITLE_LIMIT)
+    for chunk in iter_dataset_chunks('spotify_dataset', CATALOG_COLUMNS, CATALOG_DTYPES):
+        totals.fold(chunk)
+    return totals
+
+
+# Popularity sum and row count per genre, genres in order of first appearance
+@fingerprint_cached('spotify_dataset')
+def genre_popularity():
+    if CATALOG_INGESTION == 'append':
+        return catalog_ingestor().genre_frame()
+    if CATALOG_INGESTION == 'stream':
+        return streamed_catalog_totals().genre_frame()
+    data = load_dataset('spotify_dataset').dropna(subset=['popularity'])
+    totals = data.groupby('genre', sort=False, observed=True)['popularity'].agg(['sum', 'count'])
+    # Plain genre labels, as in the other ingestion modes
+    totals.index = totals.index.astype(object)
+    return totals
+
+
+# Popularity sum per (genre, artist): columns genre, artists, popularity
+@fingerprint_cached('spotify_dataset')
+def artist_popularity():
+    if CATALOG_INGESTION == 'append':
+        return catalog_ingestor().artist_frame()
+    if CATALOG_INGESTION == 'stream':
+        return streamed_catalog_totals().artist_frame()
+    data = load_dataset('spotify_dataset')[['genre', 'artists', 'popularity']].dropna()
+    totals = data.groupby(['genre', 'artists'], observed=True)['popularity'].sum().reset_index()
+    return totals.astype({'genre': object})
+
+
+@fingerprint_cached('spotify_dataset')
+def genre_artist_cube():
+    return GenreArtistCube(artist_popularity())
+
+
+# Song title -> popularity, the word cloud frequencies
+@fingerprint_cached('spotify_dataset')
+def title_popularity():
+    if CATALOG_INGESTION == 'append':
+        return catalog_ingestor().title_map()
+    if CATALOG_INGESTION == 'stream':
+        return streamed_catalog_totals().title_map()
+    data = load_dataset('spotify_dataset')[['name', 'popularity']].dropna()
+    return dict(zip(data['name'], data['popularity']))
+
+
+# Content hash of the word cloud source data, used to key the rendered images
+@fingerprint_cached('spotify_dataset')
+def title_popularity_hash():
+    titles = title_popularity()
+    data = pd.DataFrame({'name': list(titles), 'popularity': list(titles.values())})
+    row_hashes = pd.util.hash_pandas_object(data, index=False).to_numpy()
+    return hashlib.sha1(row_hashes.tobytes()).hexdigest()[:16]
+
+
+# Audio features compared in the radar chart
+RADAR_ATTRIBUTES = ['danceability', 'energy', 'acousticness', 'speechiness', 'liveness']
+
+
+# Per-genre means of the radar attributes (genres in alphabetical order), plus
+# each genre's track count, used to pick the default genres to show
+@fingerprint_cached('spotify_tracks')
+def genre_feature_means():
+    tracks = load_dataset('spotify_tracks')
+    summary = tracks.groupby('track_genre', observed=True)[RADAR_ATTRIBUTES].mean()
+    summary.index = summary.index.astype(object)
+    summary['track_count'] = tracks['track_genre'].value_counts()
+    return summary
+
+
+# The `limit` genres with the most tracks
+def top_genres_by_tracks(limit):
+    counts = genre_feature_means()['track_count']
+    return counts.sort_values(ascending=False, kind='stable').index[:limit].tolist()
+
+
+# Survey columns the user behavior page can be filtered on
+SURVEY_FILTERS = ['Age', 'Gender', 'spotify_subscription_plan', 'music_time_slot', 'fav_music_genre']
+
+# Textual podcast variety ratings as numbers
+SATISFACTION_SCORES = {
+    "Very Dissatisfied": 1,
+    "Dissatisfied": 2,
+    "Ok": 3,
+    "Satisfied": 4,
+    "Very Satisfied": 5
+}
+
+
+# Bitmap index over the user behavior survey.
+#
+# Categorical columns are held as integer codes, and every value of a filter
+# column has a bitmap (a packed boolean mask) of the rows holding it. A filter
+# combination is a bitwise OR of the selected values' bitmaps within each
+# column and an AND across columns; chart aggregates are then bincounts over
+# the codes of the selected rows, instead of pandas groupbys.
+class SurveyIndex:
+    def __init__(self, survey):
+        self.rows = len(survey)
+        self.codes = {}   # column -> int codes per row (-1 for missing)
+        self.labels = {}  # column -> labels, in sorted order
+        for column in survey.columns:
+            if isinstance(survey[column].dtype, pd.CategoricalDtype):
+                self.codes[column] = survey[column].cat.codes.to_numpy().astype(np.intp)
+                self.labels[column] = survey[column].cat.categories.to_numpy(dtype=object)
+        self.label_ids = {
+            column: {label: i for i, label in enumerate(labels)} for column, labels in self.labels.items()
+        }
+        # column -> (values, packed rows) bitmaps
+        self.bitmaps = {
+            column: np.packbits(self.codes[column] == np.arange(len(self.labels[column]))[:, None], axis=1)
+            for column in SURVEY_FILTERS if column in self.codes
+        }
+        self.music_rating = survey['music_recc_rating'].to_numpy(dtype=float)
+        self.podcast_rating = survey['pod_variety_satisfaction'].map(SATISFACTION_SCORES).astype(float).to_numpy()
+        # Filter combinations repeat as users toggle values back and forth
+        self.mask = functools.lru_cache(maxsize=256)(self._mask)
+
+    # Boolean mask of the rows matching `filters`, a tuple of (column,
+    # selected values) pairs; a column without selected values doesn't filter
+    def _mask(self, filters):
+        selected = np.full((self.rows + 7) // 8, 0xFF, dtype=np.uint8)
+        for column, values in filters:
+            ids = [self.label_ids[column][value] for value in values if value in self.label_ids[column]]
+            if values:
+                selected &= np.bitwise_or.reduce(self.bitmaps[column][ids], axis=0) if ids else 0
+        return np.unpackbits(selected, count=self.rows).view(bool)
+
+    # Row counts per combination of `columns` among the `mask` rows, like
+    # groupby(columns, observed=True).size(): sorted, with a 'count' column
+    def counts(self, columns, mask):
+        codes = [self.codes[column][mask] for column in columns]
+        present = np.logical_and.reduce([code >= 0 for code in codes])
+        shape = [len(self.labels[column]) for column in columns]
+        totals = np.bincount(
+            np.ravel_multi_index([code[present] for code in codes], shape), minlength=int(np.prod(shape))
+        )
+        combinations = np.flatnonzero(totals)
+        keys = np.unravel_index(combinations, shape)
+        frame = pd.DataFrame({column: self.labels[column][key] for column, key in zip(columns, keys)})
+        frame['count'] = totals[combinations]
+        return frame
+
+    # Mean of `values` over the `mask` rows, ignoring missing ones (None if empty)
+    @staticmethod
+    def mean(values, mask):
+        selected = values[mask]
+        selected = selected[~np.isnan(selected)]
+        return float(selected.mean()) if len(selected) else None
+
+
+@fingerprint_cached('user_behavior')
+def survey_index():
+    return SurveyIndex(load_dataset('user_behavior'))
+
+
+# Columns of the track drill-down table
+TRACK_COLUMNS = ['track_name', 'artists', 'popularity', *RADAR_ATTRIBUTES]
+
+# Separators between the artists credited on a track
+ARTIST_SEPARATORS = r'\s*;\s*|,\s+'
+
+
+# Inverted indexes from genre, artist and title to track rows.
+#
+# Each index is a CSR layout: keys are numbered, order[offsets[k]:offsets[k + 1]]
+# holds the rows of key k sorted by descending popularity, so a page of a
+# key's tracks is a slice of `order` plus a gather of PAGE rows, whatever the
+# size of the catalog. A track is listed under its own genre (track_genre) and
+# under the catalog genres of the same track id (see CatalogGenreJoin); it is
+# listed under every artist it credits.
+class TrackIndex:
+    def __init__(self, tracks):
+        self.rows = len(tracks)
+        self.columns = {column: tracks[column].to_numpy() for column in TRACK_COLUMNS if column in tracks}
+        self.own_genres = tracks['track_genre'].astype(object).to_numpy()
+        popularity = tracks['popularity'].to_numpy()
+
+        self.genre_keys, self.genre_order, self.genre_offsets = self._invert(
+            np.arange(self.rows), self.own_genres, popularity
+        )
+
+        credits = tracks['artists'].astype(object).str.split(ARTIST_SEPARATORS, regex=True).explode().dropna()
+        self.artist_keys, self.artist_order, self.artist_offsets = self._invert(
+            credits.index.to_numpy(), credits.to_numpy(dtype=object), popularity
+        )
+
+        titles = tracks['track_name'].astype(object).dropna()
+        self.title_keys, self.title_order, self.title_offsets = self._invert(
+            titles.index.to_numpy(), titles.to_numpy(dtype=object), popularity
+        )
+
+    # A copy whose genre index also lists the tracks under the catalog genres
+    # of (row, genre) pairs; the artist and title indexes are shared
+    def with_catalog_genres(self, rows, genres):
+        index = copy.copy(self)
+        index.genre_keys, index.genre_order, index.genre_offsets = self._invert(
+            np.concatenate([np.arange(self.rows), rows]), np.concatenate([self.own_genres, genres]),
+            self.columns['popularity'],
+        )
+        return index
+
+    # CSR inversion of (row, key) pairs: key -> id, rows grouped by key id
+    @staticmethod
+    def _invert(rows, keys, popularity):
+        codes, labels = pd.factorize(keys)
+        # Each (row, key) pair once
+        base = len(popularity) + 1
+        pairs = np.unique(codes.astype(np.int64) * base + rows)
+        codes, rows = np.divmod(pairs, base)
+        order = np.lexsort((rows, -popularity[rows].astype(np.int64), codes))
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(labels)))])
+        key_ids = {label: i for i, label in enumerate(labels)}
+        return key_ids, rows[order], offsets
+
+    def _index(self, kind):
+        if kind == 'artist':
+            return self.artist_keys, self.artist_order, self.artist_offsets
+        if kind == 'title':
+            return self.title_keys, self.title_order, self.title_offsets
+        return self.genre_keys, self.genre_order, self.genre_offsets
+
+    # Number of tracks listed under a genre, artist or title
+    def count(self, kind, key):
+        keys, _, offsets = self._index(kind)
+        i = keys.get(key)
+        return 0 if i is None else int(offsets[i + 1] - offsets[i])
+
+    # Rows of page `page` (0-based) of a genre's, artist's or title's tracks, as records
+    def page(self, kind, key, page, page_size):
+        keys, order, offsets = self._index(kind)
+        i = keys.get(key)
+        if i is None:
+            return []
+        start = offsets[i] + page * page_size
+        rows = order[start:min(start + page_size, offsets[i + 1])]
+        page_columns = {
+            column: (np.round(values[rows].astype(float), 3) if values.dtype.kind == 'f' else values[rows]).tolist()
+            for column, values in self.columns.items()
+        }
+        return [dict(zip(page_columns, record)) for record in zip(*page_columns.values())]
+
+
+# Catalog genres of the tracks: (track row, genre) pairs, joined on track id
+# chunk by chunk as catalog rows come in
+class CatalogGenreJoin:
+    def __init__(self, track_ids):
+        self._by_id = pd.DataFrame({'id': np.asarray(track_ids, dtype=object), 'row': np.arange(len(track_ids))})
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._rows, self._genres = [], []
+
+    def fold(self, chunk):
+        # Catalogs without track ids can't be joined
+        if 'id' not in chunk or 'genre' not in chunk:
+            return
+        matched = self._by_id.merge(chunk[['id', 'genre']].dropna().astype(object), on='id')
+        with self._lock:
+            self._rows.append(matched['row'].to_numpy())
+            self._genres.append(matched['genre'].to_numpy(dtype=object))
+
+    def pairs(self):
+        with self._lock:
+            rows, genres = list(self._rows), list(self._genres)
+        return (
+            np.concatenate(rows) if rows else np.zeros(0, dtype=np.int64),
+            np.concatenate(genres) if genres else np.zeros(0, dtype=object),
+        )
+
+
+# A structure derived from data that changes, rebuilt in a background thread
+# whenever `version()` changes. Callers keep getting the last one built in
+# the meantime; only the very first build runs on the caller's thread.
+class BackgroundRebuilt:
+    def __init__(self, version, build):
+        self.version = version
+        self.build = build
+        self._lock = threading.Lock()
+        self._first_build = threading.Lock()
+        self._built = None       # (version, value)
+        self._rebuilding = None  # pid of the process whose thread is rebuilding
+
+    def _rebuild(self, version):
+        try:
+            value = self.build()
+            with self._lock:
+                self._built = (version, value)
+        except Exception:
+            logger.exception("Rebuilding %s failed", self.build.__name__)
+        finally:
+            with self._lock:
+                self._rebuilding = None
+
+    def get(self):
+        version = self.version()
+        with self._lock:
+            built = self._built
+            # A rebuild started before a fork has no thread in this process
+            if built is not None and built[0] != version and self._rebuilding != os.getpid():
+                self._rebuilding = os.getpid()
+                threading.Thread(target=self._rebuild, args=(version,), daemon=True).start()
+        if built is not None:
+            return built[1]
+        with self._first_build:
+            if self._built is None:
+                value = self.build()
+                with self._lock:
+                    self._built = (version, value)
+            return self._built[1]
+
+
+# Track indexes over the tracks alone (own genres, artists, titles)
+@fingerprint_cached('spotify_tracks')
+def track_base_index():
+    return TrackIndex(load_dataset('spotify_tracks'))
+
+
+# Append mode: the catalog genre join is fed the rows the ingestor folds in,
+# so an append only joins the new rows
+@fingerprint_cached('spotify_tracks')
+def ingested_genre_join():
+    join = CatalogGenreJoin(load_dataset('spotify_tracks')['track_id'].to_numpy())
+    catalog_ingestor().subscribe('track_genres', join)
+    return join
+
+
+# Other modes: the catalog genre join of the streamed catalog
+@fingerprint_cached('spotify_tracks', 'spotify_dataset')
+def streamed_genre_join():
+    join = CatalogGenreJoin(load_dataset('spotify_tracks')['track_id'].to_numpy())
+    for chunk in iter_dataset_chunks('spotify_dataset', ['id', 'genre'], {'id': str, 'genre': str}):
+        join.fold(chunk)
+    return join
+
+
+def _track_index_version():
+    if CATALOG_INGESTION == 'append':
+        # Folds the appended rows only (into the join too)
+        ingestor = catalog_ingestor()
+        return (dataset_fingerprints('spotify_tracks'), ingestor.generation, ingestor.offset)
+    return dataset_fingerprints('spotify_tracks', 'spotify_dataset')
+
+
+def _build_track_index():
+    join = ingested_genre_join() if CATALOG_INGESTION == 'append' else streamed_genre_join()
+    return track_base_index().with_catalog_genres(*join.pairs())
+
+
+_track_index = BackgroundRebuilt(_track_index_version, _build_track_index)
+
+
+# Track inverted indexes with the catalog genres. When the tracks or the
+# catalog change, they are rebuilt off the request path; requests keep the
+# previous version until the new one is ready.
+def track_index():
+    return _track_index.get()
+
+
+# Titles and artists of the tracks, each with its best track popularity
+def search_entries():
+    tracks = load_dataset('spotify_tracks')
+    titles = tracks.groupby(tracks['track_name'].astype(object))['popularity'].max()
+    credits = tracks['artists'].astype(object).str.split(ARTIST_SEPARATORS, regex=True)
+    artists = tracks[['popularity']].assign(artist=credits).explode('artist').groupby('artist')['popularity'].max()
+    return (
+        titles.index.tolist() + artists.index.tolist(),
+        [SEARCH_KINDS.index('title')] * len(titles) + [SEARCH_KINDS.index('artist')] * len(artists),
+        titles.tolist() + artists.tolist(),
+    )
+
+
+# Typeahead index over the tracks' titles and artists, loaded from disk when
+# this version of the tracks was already indexed
+@fingerprint_cached('spotify_tracks')
+def search_index():
+    return load_or_build(dataset_fingerprints('spotify_tracks'), search_entries)
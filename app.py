@@ -1,22 +1,39 @@
 # Made by Hemaksh Chaturvedi
 
+import os
+import re
+import logging
 import dash
-from dash import dcc, html, Input, Output
-import pandas as pd
-import random
-import networkx as nx
+from dash import dcc, html, dash_table, Input, Output, State, ClientsideFunction, Patch
+from dash.exceptions import PreventUpdate
+import numpy as np
 import plotly.graph_objects as go
 import plotly.express as px
-import matplotlib.pyplot as plt
-from wordcloud import WordCloud
-import base64
-import io
+from flask import abort, jsonify, send_file
 from plotly.subplots import make_subplots
+from data_store import DATA_SOURCES, dataset_memory, load_dataset, process_peak_rss
+from aggregates import (
+    ARTIST_SEPARATORS, RADAR_ATTRIBUTES, SURVEY_FILTERS, genre_artist_cube, search_index, survey_index, track_index, genre_feature_means, genre_popularity, title_popularity,
+    title_popularity_hash, top_genres_by_tracks,
+)
+from ingest import INCREMENTAL_DATASETS
+from figure_cache import (
+    cached_callback, cached_layout, figure_cache, layout_cache, quantize_value, quantize_range,
+)
+from serialization import compact_trace, install_payload_tracking, payload_stats, serialize_output
+from instrumentation import install_metrics, span, staged, traced
+from callback_pool import checkpoint, install_callback_sessions, superseding
+from collaboration import CollaborationIndex
+from graph_layout import layout_service
+from wordcloud_cache import WORDCLOUD_SIZES, WORDCLOUD_FORMATS, ensure_wordcloud, wordcloud_path
+
+logger = logging.getLogger(__name__)
 
 # Create Dash app
 app = dash.Dash(
     __name__,
     suppress_callback_exceptions=True,
+    compress=True,  # gzip/Brotli responses (flask-compress)
     external_stylesheets=[
         "https://cdnjs.cloudflare.com/ajax/libs/font-awesome/5.15.4/css/all.min.css"
     ]
@@ -24,6 +41,39 @@ app = dash.Dash(
 
 app.title = "Spotify Multi-Page Dashboard"
 
+# Compressed responses plus per-callback payload sizes, reported on /payload-stats
+install_payload_tracking(app.server)
+
+# Session cookie telling apart the requests of each browser, so a newer
+# request of a slow callback supersedes the older ones (see callback_pool.py)
+install_callback_sessions(app.server)
+
+@app.server.route('/payload-stats')
+def serve_payload_stats():
+    return jsonify(payload_stats.snapshot())
+
+# Per-callback latency and stage timings (DASH_METRICS=1), cache and payload
+# statistics, on /metrics
+install_metrics(
+    app.server, caches={'figure': figure_cache, 'layout': layout_cache}, payloads=payload_stats,
+    datasets=dataset_memory
+)
+
+# Where the collaboration graph sliders are applied: 'server' (Dash callback)
+# or 'client' (node data shipped once to the browser and filtered there)
+COLLABORATION_FILTERING = os.environ.get('COLLABORATION_FILTERING', 'server')
+
+# Seed for the simulated collaboration popularity scores
+COLLABORATION_SEED = int(os.environ.get('COLLABORATION_SEED', 42))
+
+# Above this many nodes the collaboration graph is drawn with WebGL (Scattergl)
+SCATTERGL_THRESHOLD = int(os.environ.get('SCATTERGL_THRESHOLD', 5000))
+
+# Artists shown per genre in the sunburst; the rest are summed into an "Other"
+# node. A clicked genre shows up to SUNBURST_EXPANDED_ARTISTS of its artists.
+SUNBURST_TOP_ARTISTS = int(os.environ.get('SUNBURST_TOP_ARTISTS', 10))
+SUNBURST_EXPANDED_ARTISTS = int(os.environ.get('SUNBURST_EXPANDED_ARTISTS', 500))
+
 # Add custom CSS directly into the layout
 # Corrected custom_styles definition
 custom_styles = html.Div([
@@ -81,61 +131,99 @@ custom_styles = html.Div([
 
 
 # Load simulated collaboration data
-simulated_edges_df = pd.read_csv('simulated_collaborations.csv')
-
-# Create a NetworkX graph
-G = nx.Graph()
-G.add_edges_from(simulated_edges_df.values)
+simulated_edges_df = load_dataset('collaborations')
+
+# Array-backed collaboration graph with random popularity scores (10-100) per
+# artist and reach = number of collaborators, indexed for the slider ranges.
+# PageRank and communities are computed once here, not per request. The
+# scores are seeded so every worker process (and every restart) shows the same graph.
+collaboration_index = CollaborationIndex.from_edges(
+    simulated_edges_df, rng=np.random.default_rng(COLLABORATION_SEED)
+)
 
-# Add node attributes (e.g., random popularity scores and collaboration reach)
-for node in G.nodes:
-    G.nodes[node]['popularity'] = random.randint(10, 100)  # Popularity scores (10-100)
-    G.nodes[node]['reach'] = random.randint(1, 50)         # Collaboration reach (1-50)
+# Upper bound of the reach slider: the most collaborators of any artist
+REACH_MAX = max(int(collaboration_index.reach.max()), 2)
+
+# Node metrics selectable for marker color and size
+NODE_COLOR_METRICS = {
+    'popularity': 'Popularity',
+    'reach': 'Collaborators',
+    'pagerank': 'PageRank',
+    'community': 'Community',
+}
+NODE_SIZE_METRICS = {key: label for key, label in NODE_COLOR_METRICS.items() if key != 'community'}
+
+# Palette cycled through by community label
+COMMUNITY_COLORS = px.colors.qualitative.Set3
+
+# Cache key of the graph's force-directed layout, computed in the background
+# (see graph_layout.py) and offered as an alternative to popularity/reach positions
+collaboration_layout_key = layout_service.key(
+    collaboration_index.sources, collaboration_index.targets, collaboration_index.node_count
+)
 
-# Load Spotify tracks dataset
-spotify_tracks_path = "Data/spotify_tracks_dataset.csv"  # Replace with your file path
-spotify_tracks = pd.read_csv(spotify_tracks_path)
+# Start computing the force-directed layout unless it is cached; never blocks
+def ensure_collaboration_layout():
+    layout_service.ensure(
+        collaboration_index.sources, collaboration_index.targets, collaboration_index.node_count
+    )
 
 # Attributes for Radar Chart
-attributes = ['danceability', 'energy', 'acousticness', 'speechiness', 'liveness']
-
-# Load artificial dataset for Word Cloud
-artificial_data_path = "Data/spotify_dataset.csv"  # Replace with your file path
-artificial_data = pd.read_csv(artificial_data_path)
-artificial_data = artificial_data[['name', 'popularity']].dropna()
-title_popularity_dict = dict(zip(artificial_data['name'], artificial_data['popularity']))
-
-# Generate Word Cloud
-def generate_wordcloud():
-    wordcloud = WordCloud(
-        width=800,
-        height=800,
-        background_color="#191414",  # Spotify Black
-        colormap="Greens",  # Spotify Green theme
-        contour_color="#1db954",  # Spotify Green contour
-        contour_width=2,
-        max_words=200,
-        prefer_horizontal=0.8
-    ).generate_from_frequencies(title_popularity_dict)
-
-    # Save the word cloud to a buffer
-    buffer = io.BytesIO()
-    plt.figure(figsize=(10, 10), facecolor="#191414")
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis("off")
-    plt.tight_layout(pad=0)
-    plt.savefig(buffer, format="png", facecolor="#191414")
-    buffer.seek(0)
-    image_data = base64.b64encode(buffer.read()).decode("utf-8")
-    buffer.close()
-    return image_data
-
-wordcloud_image = generate_wordcloud()
+attributes = RADAR_ATTRIBUTES
+
+# Number of genres shown on the radar chart before the user picks any
+RADAR_DEFAULT_GENRES = 5
+
+# Tracks per page of the drill-down table
+TRACK_PAGE_SIZE = int(os.environ.get('TRACK_PAGE_SIZE', 20))
+
+# Drill-down table columns: track columns -> headers
+TRACK_TABLE_COLUMNS = {
+    'track_name': "Title",
+    'artists': "Artists",
+    'popularity': "Popularity",
+    **{attribute: attribute.capitalize() for attribute in RADAR_ATTRIBUTES},
+}
+
+# Typeahead suggestions shown for a search
+SEARCH_RESULTS = int(os.environ.get('SEARCH_RESULTS', 10))
+
+# Word Cloud: rendered on first request at several sizes/formats, cached on disk
+# per data hash and served as a static image (see wordcloud_cache.py)
+@app.server.route('/wordcloud/<data_hash>/<int:size>.<fmt>')
+def serve_wordcloud(data_hash, size, fmt):
+    if data_hash != title_popularity_hash() or size not in WORDCLOUD_SIZES or fmt not in WORDCLOUD_FORMATS:
+        abort(404)
+    ensure_wordcloud(data_hash, title_popularity)
+    # The URL carries the data hash, so the image never changes under it
+    return send_file(
+        wordcloud_path(data_hash, size, fmt),
+        mimetype=WORDCLOUD_FORMATS[fmt],
+        etag=f"{data_hash}-{size}.{fmt}",
+        max_age=31536000,
+        conditional=True,
+    )
+
+# Word cloud <picture>: WebP with a PNG fallback, 1x/2x for high-DPI screens
+def wordcloud_picture():
+    base = f"/wordcloud/{title_popularity_hash()}"
+    return html.Picture([
+        html.Source(srcSet=f"{base}/800.webp 1x, {base}/1600.webp 2x", type="image/webp"),
+        html.Img(
+            src=f"{base}/800.png",
+            srcSet=f"{base}/800.png 1x, {base}/1600.png 2x",
+            width=800,
+            height=800,
+            style={'display': 'block', 'margin': '0 auto', 'borderRadius': '10px'}
+        ),
+    ])
 
 # Create Tree Map
+@staged('build_figure')
 def create_treemap():
-    spotify_dataset = pd.read_csv('Data/spotify_dataset.csv')  # Replace with your file path
-    genre_popularity = spotify_dataset.groupby('genre')['popularity'].mean().reset_index()
+    # Average popularity per genre, from the maintained per-genre sum and count
+    totals = genre_popularity().sort_index()
+    average_popularity = (totals['sum'] / totals['count']).rename('popularity').reset_index()
 
     # Spotify Palette
     spotify_palette = [
@@ -144,7 +232,7 @@ def create_treemap():
     ]
 
     fig = px.treemap(
-        genre_popularity,
+        average_popularity,
         path=['genre'],  # Hierarchical data: Just genres in this case
         values='popularity',  # Size of each rectangle corresponds to average popularity
         color='popularity',  # Color based on popularity
@@ -180,17 +268,26 @@ def create_treemap():
     )
     return fig
 
-treemap_figure = create_treemap()
+# Labels of the User Behavior page filters
+SURVEY_FILTER_LABELS = {
+    'Age': "Age",
+    'Gender': "Gender",
+    'spotify_subscription_plan': "Subscription Plan",
+    'music_time_slot': "Time Slot",
+    'fav_music_genre': "Favourite Genre",
+}
 
-# Create Sunburst Chart for User Behavior Page
-def create_sunburst():
-    user_behavior_dataset = pd.read_excel('Data/Spotify_User_Behavior_Dataset.xlsx')
+# Survey rows matching the User Behavior page filters, as a boolean mask.
+# `filters` is a tuple of (column, selected values) pairs; () selects everyone.
+def survey_mask(filters):
+    return survey_index().mask(filters)
 
+# Create Sunburst Chart for User Behavior Page
+@staged('build_figure')
+def create_sunburst(filters=()):
     # Prepare data for the Sunburst chart
-    sunburst_data = (
-        user_behavior_dataset.groupby(['spotify_subscription_plan', 'premium_sub_willingness'])
-        .size()
-        .reset_index(name='count')
+    sunburst_data = survey_index().counts(
+        ['spotify_subscription_plan', 'premium_sub_willingness'], survey_mask(filters)
     )
 
     fig = px.sunburst(
@@ -215,13 +312,10 @@ def create_sunburst():
     )
     return fig
 
-sunburst_figure = create_sunburst()
-
-def create_polar_chart():
-    user_behavior_dataset = pd.read_excel('Data/Spotify_User_Behavior_Dataset.xlsx')
-
+@staged('build_figure')
+def create_polar_chart(filters=()):
     # Filter and prepare data for polar chart
-    polar_data = user_behavior_dataset.groupby(['Age', 'music_time_slot']).size().reset_index(name='count')
+    polar_data = survey_index().counts(['Age', 'music_time_slot'], survey_mask(filters))
 
     # Create a polar chart with enhanced visuals
     fig = px.line_polar(
@@ -273,25 +367,13 @@ def create_polar_chart():
     )
     return fig
 
-def create_gauge_plot():
-    # Load the Spotify User Behavior dataset
-    user_behavior_dataset = pd.read_excel('Data/Spotify_User_Behavior_Dataset.xlsx')
-
-    # Map textual ratings to numeric values
-    satisfaction_mapping = {
-        "Very Dissatisfied": 1,
-        "Dissatisfied": 2,
-        "Ok": 3,
-        "Satisfied": 4,
-        "Very Satisfied": 5
-    }
-
-    # Map columns
-    user_behavior_dataset['pod_variety_satisfaction_numeric'] = user_behavior_dataset['pod_variety_satisfaction'].map(satisfaction_mapping)
-
-    # Calculate averages
-    average_music_satisfaction = user_behavior_dataset['music_recc_rating'].mean()
-    average_podcast_satisfaction = user_behavior_dataset['pod_variety_satisfaction_numeric'].mean()
+@staged('build_figure')
+def create_gauge_plot(filters=()):
+    # Calculate averages (textual podcast ratings are mapped to 1-5 by the index)
+    index = survey_index()
+    mask = survey_mask(filters)
+    average_music_satisfaction = index.mean(index.music_rating, mask)
+    average_podcast_satisfaction = index.mean(index.podcast_rating, mask)
 
     # Create the subplot layout for two gauges side by side
     fig = make_subplots(rows=1, cols=2, specs=[[{"type": "indicator"}, {"type": "indicator"}]])
@@ -353,15 +435,12 @@ def create_gauge_plot():
     )
 
     return fig
-def create_circle_pack_diagram():
-    # Load data
-    xl = pd.ExcelFile(r"Data/Spotify_User_Behavior_Dataset.xlsx")
-    spotify_user_behavior_data = xl.parse('Sheet1')
-    
+@staged('build_figure')
+def create_circle_pack_diagram(filters=()):
     # Preparing data for a circle pack diagram
-    circle_pack_data = spotify_user_behavior_data.groupby(
-        ['spotify_subscription_plan', 'music_time_slot', 'fav_music_genre']
-    ).size().reset_index(name='count')
+    circle_pack_data = survey_index().counts(
+        ['spotify_subscription_plan', 'music_time_slot', 'fav_music_genre'], survey_mask(filters)
+    )
 
     # Creating the circle pack diagram
     fig = px.treemap(
@@ -428,6 +507,7 @@ app.layout = html.Div(
 
 
 # Define the landing page
+@traced('render_landing_page')
 def render_landing_page():
     return html.Div(
         className="bubbles",
@@ -458,23 +538,25 @@ def render_landing_page():
     )
 
 
-# Page: For Artists
-def render_artists_page():
-    # Compute spotify_tracks_summary locally to avoid scope issues
-    spotify_tracks_summary = spotify_tracks.groupby('track_genre')[attributes].mean().reset_index()
-    
-    # Radar Chart
-    fig_radar = go.Figure()
-    for i, row in spotify_tracks_summary.iterrows():
-        fig_radar.add_trace(go.Scatterpolar(
-            r=row[attributes].tolist(),
-            theta=attributes,
-            fill='toself',
-            name=row['track_genre'],
-            opacity=0.8,
-            line=dict(color=spotify_colors[i % len(spotify_colors)], width=2),
-            fillcolor=spotify_colors[i % len(spotify_colors)],
-        ))
+# Radar Chart trace for one genre, from the precomputed per-genre feature means
+@staged('build_figure')
+def create_radar_trace(genre):
+    means = genre_feature_means()
+    # Colors follow the genre's position in the full (alphabetical) genre list
+    i = means.index.get_loc(genre)
+    return go.Scatterpolar(
+        r=means.loc[genre, attributes].tolist(),
+        theta=attributes,
+        fill='toself',
+        name=genre,
+        opacity=0.8,
+        line=dict(color=spotify_colors[i % len(spotify_colors)], width=2),
+        fillcolor=spotify_colors[i % len(spotify_colors)],
+    )
+
+@staged('build_figure')
+def create_radar_chart(genres):
+    fig_radar = go.Figure([create_radar_trace(genre) for genre in genres])
 
     fig_radar.update_layout(
         polar=dict(
@@ -487,6 +569,14 @@ def render_artists_page():
         height=1000,
         width= 2300
     )
+    return fig_radar
+
+
+# Page: For Artists
+@traced('render_artists_page')
+def render_artists_page():
+    # Radar Chart: starts with the genres that have the most tracks
+    radar_genres = top_genres_by_tracks(RADAR_DEFAULT_GENRES)
 
     return html.Div([
         html.H1('For Artists: Insights', style={'textAlign': 'center', 'color': '#1db954'}),
@@ -494,12 +584,12 @@ def render_artists_page():
         # Word Cloud Section
         html.Div([
             html.H3('Popular Song Titles', style={'textAlign': 'center', 'color': '#1db954'}),
-            html.Img(src=f"data:image/png;base64,{wordcloud_image}", style={'display': 'block', 'margin': '0 auto', 'borderRadius': '10px'})
+            wordcloud_picture()
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
 
         # Tree Map Section
         html.Div([
-            dcc.Graph(figure=treemap_figure)
+            dcc.Graph(id='genre-treemap', figure=create_treemap())
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
 
         # Filters and Collaboration Graph
@@ -511,68 +601,189 @@ def render_artists_page():
                 max=100,
                 step=5,
                 marks={10: '10', 50: '50', 100: '100'},
-                value=[10, 100]
+                value=[10, 100],
+                # Filtering in the browser is cheap enough to follow the drag
+                updatemode='drag' if COLLABORATION_FILTERING == 'client' else 'mouseup'
             ),
             html.Br(),
-            html.Label("Filter by Collaboration Reach (Y-axis)", style={'color': '#e1ece3', 'fontSize': '14px'}),
+            html.Label("Filter by Collaboration Reach (Collaborators, Y-axis)", style={'color': '#e1ece3', 'fontSize': '14px'}),
             dcc.RangeSlider(
                 id='reach-filter',
                 min=1,
-                max=50,
+                max=REACH_MAX,
                 step=1,
-                marks={1: '1', 25: '25', 50: '50'},
-                value=[1, 50]
+                marks={1: '1', (REACH_MAX + 1) // 2: str((REACH_MAX + 1) // 2), REACH_MAX: str(REACH_MAX)},
+                value=[1, REACH_MAX],
+                updatemode='drag' if COLLABORATION_FILTERING == 'client' else 'mouseup'
             ),
+            # Node metrics shown as marker color and size
+            html.Div([
+                html.Label("Color by", style={'color': '#e1ece3', 'fontSize': '14px'}),
+                dcc.Dropdown(
+                    id='collaboration-color',
+                    options=[{'label': label, 'value': key} for key, label in NODE_COLOR_METRICS.items()],
+                    value='popularity',
+                    clearable=False,
+                    style={'width': '180px', 'color': '#232723'}
+                ),
+                html.Label("Size by", style={'color': '#e1ece3', 'fontSize': '14px'}),
+                dcc.Dropdown(
+                    id='collaboration-size',
+                    options=[{'label': label, 'value': key} for key, label in NODE_SIZE_METRICS.items()],
+                    value='popularity',
+                    clearable=False,
+                    style={'width': '180px', 'color': '#232723'}
+                ),
+            ], style={'display': 'flex', 'alignItems': 'center', 'gap': '10px', 'marginTop': '10px'}),
+            # Node positions: popularity/reach, or the force-directed layout once computed
+            *([dcc.RadioItems(
+                id='collaboration-layout',
+                options=collaboration_layout_options(),
+                value='scores',
+                inline=True,
+                style={'color': '#e1ece3', 'fontSize': '14px', 'marginTop': '10px'},
+                inputStyle={'marginRight': '5px', 'marginLeft': '15px'},
+            ),
+               # Checks until the force-directed layout is available
+               dcc.Interval(id='collaboration-layout-poll', interval=2000)]
+              if COLLABORATION_FILTERING == 'server' else []),
             dcc.Graph(id='collaboration-graph'),
+            *([dcc.Store(id='collaboration-data', data=collaboration_store)]
+              if COLLABORATION_FILTERING == 'client' else []),
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
 
         # Radar Chart
         html.Div([
-            dcc.Graph(figure=fig_radar)
+            html.Label("Genres to Compare:", style={'color': '#e1ece3', 'fontSize': '14px'}),
+            dcc.Dropdown(
+                id='radar-genre-select',
+                options=genre_feature_means().index.tolist(),
+                value=radar_genres,
+                multi=True,
+                style={'color': '#000000', 'backgroundColor': '#e1ece3'}
+            ),
+            # Genres currently drawn, in trace order
+            dcc.Store(id='radar-genres-shown', data=radar_genres),
+            dcc.Graph(id='radar-chart', figure=create_radar_chart(radar_genres))
+        ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
+
+        # Track drill-down: filled by clicking a genre in the tree map or radar
+        # chart or a track's artists in the table, or by searching a title or artist
+        html.Div([
+            html.H3("Click a genre in the tree map or radar chart to list its tracks",
+                    id='track-table-title', style={'textAlign': 'center', 'color': '#1db954'}),
+            dcc.Dropdown(
+                id='track-search',
+                options=[],
+                placeholder="Search titles and artists...",
+                style={'color': '#000000', 'backgroundColor': '#e1ece3', 'marginBottom': '10px'}
+            ),
+            dcc.Store(id='track-drill'),
+            dash_table.DataTable(
+                id='track-table',
+                columns=[{'name': header, 'id': column} for column, header in TRACK_TABLE_COLUMNS.items()],
+                data=[],
+                page_action='custom',
+                page_current=0,
+                page_size=TRACK_PAGE_SIZE,
+                page_count=1,
+                style_header={'backgroundColor': '#191414', 'color': '#1db954', 'fontWeight': 'bold'},
+                style_cell={'backgroundColor': '#232723', 'color': '#e1ece3', 'border': '1px solid #4d4d4d',
+                            'textAlign': 'left', 'maxWidth': '300px', 'overflow': 'hidden',
+                            'textOverflow': 'ellipsis'},
+            ),
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px'})
     ])
 
 # Page: User Behavior
+@traced('render_user_behavior_page')
 def render_user_behavior_page():
     # Create the gauge plot
     gauge_figure = create_gauge_plot()
+    index = survey_index()
     
     return html.Div([
         html.H1('User Behavior Insights', style={'textAlign': 'center', 'color': '#1db954'}),
+
+        # Filters applied to all four charts; no selection means everyone
+        html.Div([
+            html.Div([
+                html.Label(f"{label}:", style={'color': '#e1ece3', 'fontSize': '14px'}),
+                dcc.Dropdown(
+                    id=f'survey-filter-{column}',
+                    options=[{'label': value, 'value': value} for value in index.labels[column]],
+                    multi=True,
+                    placeholder="All",
+                    style={'color': '#000000', 'backgroundColor': '#e1ece3'}
+                ),
+            ], style={'flex': '1', 'minWidth': '180px'})
+            for column, label in SURVEY_FILTER_LABELS.items()
+        ], style={'display': 'flex', 'flexWrap': 'wrap', 'gap': '10px', 'padding': '20px',
+                  'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
         
         # Sunburst Chart Section
         html.Div([
-            dcc.Graph(figure=sunburst_figure)
+            dcc.Graph(id='user-behavior-sunburst', figure=create_sunburst())
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
 
         # Polar Chart Section
         html.Div([
-            dcc.Graph(figure=create_polar_chart())
+            dcc.Graph(id='user-behavior-polar', figure=create_polar_chart())
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px'}),
 
         # Gauge Plot Section
         html.Div([
-            dcc.Graph(figure=gauge_figure)
+            dcc.Graph(id='user-behavior-gauge', figure=gauge_figure)
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
 
         # Circle Pack Diagram Section
         html.Div([
             html.H3("User Behavior Clustering", style={'textAlign': 'center', 'color': '#1db954'}),
-            dcc.Graph(figure=create_circle_pack_diagram())
+            dcc.Graph(id='user-behavior-circle-pack', figure=create_circle_pack_diagram())
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
     ])
 
+# Filter dropdown values as a hashable ((column, values), ...) tuple, empty
+# selections dropped and values sorted, so equivalent filters share cache entries
+def normalize_survey_filters(*selections):
+    filters = tuple(
+        (column, tuple(sorted(values))) for column, values in zip(SURVEY_FILTERS, selections) if values
+    )
+    return (filters,)
+
+# Each chart is memoized per filter combination
+USER_BEHAVIOR_CHARTS = [
+    cached_callback('user_behavior')(chart)
+    for chart in (create_sunburst, create_polar_chart, create_gauge_plot, create_circle_pack_diagram)
+]
+
+# One callback redraws all four charts when any filter changes; the row
+# selection is a few bitmap operations shared by the charts (see SurveyIndex)
+@app.callback(
+    [Output('user-behavior-sunburst', 'figure'),
+     Output('user-behavior-polar', 'figure'),
+     Output('user-behavior-gauge', 'figure'),
+     Output('user-behavior-circle-pack', 'figure')],
+    [Input(f'survey-filter-{column}', 'value') for column in SURVEY_FILTERS],
+    prevent_initial_call=True
+)
+@traced('update_user_behavior_charts')
+def update_user_behavior_charts(*selections):
+    filters, = normalize_survey_filters(*selections)
+    return [chart(filters) for chart in USER_BEHAVIOR_CHARTS]
+
 
 
+# Initial genre dropdown and slider values; the page ships with the matching sunburst
+DEFAULT_GENRE = "All"
+DEFAULT_GENRE_LIMIT = 5
+
 # Page: Genre Popularity with Filters
+@traced('render_genre_popularity_page')
 def render_genre_popularity_page():
-    # Load dataset
-    data_path = "Data/spotify_dataset.csv"  # Replace with your file path
-    spotify_data = pd.read_csv(data_path)
-
-    # Dropdown options for genres
+    # Dropdown options for genres, in catalog order
     dropdown_options = [{"label": "All Genres", "value": "All"}]
-    dropdown_options += [{"label": genre, "value": genre} for genre in spotify_data['genre'].unique()]
+    dropdown_options += [{"label": genre, "value": genre} for genre in genre_popularity().index]
 
     # Layout for the page
     layout = html.Div([
@@ -584,7 +795,7 @@ def render_genre_popularity_page():
             dcc.Dropdown(
                 id='genre-dropdown',
                 options=dropdown_options,
-                value="All",
+                value=DEFAULT_GENRE,
                 placeholder="Select a genre",
                 style={'color': '#000000', 'backgroundColor': '#e1ece3'}
             ),
@@ -595,68 +806,52 @@ def render_genre_popularity_page():
                 min=1,
                 max=100,
                 step=1,
-                value=5,  # Default value
-                marks={i: str(i) for i in range(1, 101)},  # Limit to 10 genres
-                tooltip={"placement": "bottom", "always_visible": True},
+                value=DEFAULT_GENRE_LIMIT,  # Default value
+                marks={i: str(i) for i in [1, *range(10, 101, 10)]},
+                tooltip={"placement": "bottom", "always_visible": True}
             )
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px', 'marginBottom': '20px'}),
         
-        # Sunburst Chart
+        # Sunburst Chart; clicking a genre expands its artists (see drill_sunburst_chart)
         html.Div([
-            dcc.Graph(id='sunburst-chart')
+            dcc.Graph(id='sunburst-chart', figure=create_genre_sunburst(DEFAULT_GENRE, DEFAULT_GENRE_LIMIT)),
+            dcc.Store(id='sunburst-expanded-genre', data=None),
         ], style={'padding': '20px', 'backgroundColor': '#232723', 'borderRadius': '10px'})
     ], style={'backgroundColor': '#191414', 'padding': '20px', 'borderRadius': '10px'})
 
     return layout
 
-@app.callback(
-    Output('sunburst-chart', 'figure'),
-    [Input('genre-dropdown', 'value'),
-     Input('genre-limit-slider', 'value')]
-)
-def update_sunburst_chart(selected_genre, genre_limit):
-    # Load dataset
-    data_path = "Data/spotify_dataset.csv"  # Replace with your file path
-    spotify_data = pd.read_csv(data_path)
-
-    # Select and clean relevant columns
-    spotify_data = spotify_data[['genre', 'artists', 'popularity']].dropna()
-
-    # Aggregate data for visualization
-    genre_data = spotify_data.groupby('genre').agg({'popularity': 'sum'}).reset_index()
-    artist_data = spotify_data.groupby(['genre', 'artists']).agg({'popularity': 'sum'}).reset_index()
-
-    # Sort genres by popularity and apply genre limit
-    genre_data = genre_data.sort_values('popularity', ascending=False).head(genre_limit)
-    artist_data = artist_data[artist_data['genre'].isin(genre_data['genre'])]
-
-    # Create Sunburst chart data based on the selected genre
-    def create_sunburst_data(selected_genre=None):
-        if selected_genre and selected_genre != "All":
-            filtered_artist_data = artist_data[artist_data['genre'] == selected_genre]
-            filtered_genre_data = genre_data[genre_data['genre'] == selected_genre]
-        else:
-            filtered_artist_data = artist_data
-            filtered_genre_data = genre_data
-
-        labels = list(filtered_genre_data['genre'])
-        parents = [''] * len(filtered_genre_data)
-        values = list(filtered_genre_data['popularity'])
-
-        for _, row in filtered_artist_data.iterrows():
-            labels.append(row['artists'])
-            parents.append(row['genre'])
-            values.append(row['popularity'])
-
-        return labels, parents, values
-
-    labels, parents, values = create_sunburst_data(selected_genre)
+# Map sunburst inputs onto the dropdown/slider domain so equivalent requests
+# share a cache entry. An expanded genre that isn't shown is dropped.
+def normalize_sunburst_inputs(selected_genre, genre_limit, expanded_genre=None):
+    selected_genre, genre_limit = selected_genre or "All", quantize_value(genre_limit, 1, 100, 1)
+    cube = genre_artist_cube()
+    shown = cube.genre_slice(selected_genre, genre_limit)
+    if not isinstance(expanded_genre, str) or not shown.start <= cube.genre_rank.get(expanded_genre, -1) < shown.stop:
+        expanded_genre = None
+    return (selected_genre, genre_limit, expanded_genre)
+
+# Sunburst ids/labels/parents/values for a dropdown/slider combination, memoized
+# on the normalized inputs. Genre ranking and per-genre artist sums are
+# precomputed once per dataset version, so a miss is just a slice of the top
+# `genre_limit` genres and of their top artists: the payload is bounded by
+# genre_limit * SUNBURST_TOP_ARTISTS (+ SUNBURST_EXPANDED_ARTISTS) sectors.
+@cached_callback('spotify_dataset', normalize=normalize_sunburst_inputs)
+def sunburst_chart_data(selected_genre, genre_limit, expanded_genre):
+    checkpoint()
+    cube = genre_artist_cube()
+    checkpoint()
+    with span('aggregate'):
+        ids, labels, parents, values = cube.sunburst_data(
+            selected_genre, genre_limit, SUNBURST_TOP_ARTISTS, expanded_genre, SUNBURST_EXPANDED_ARTISTS
+        )
+    return {'ids': ids, 'labels': labels, 'parents': parents, 'values': values}
 
-    # Create Sunburst chart
+# Create Sunburst chart (layout is sent once, with the page)
+@staged('build_figure')
+def create_genre_sunburst(selected_genre, genre_limit):
     fig = go.Figure(go.Sunburst(
-        labels=labels,
-        parents=parents,
-        values=values,
+        **sunburst_chart_data(selected_genre, genre_limit, None),
         branchvalues="total",
         hoverinfo="label+value+percent entry",
         marker=dict(colorscale="Greens")
@@ -680,46 +875,110 @@ def update_sunburst_chart(selected_genre, genre_limit):
 
     return fig
 
+# Partial update replacing the sunburst's data arrays, zoomed into `expanded_genre`
+def sunburst_patch(selected_genre, genre_limit, expanded_genre):
+    patched_figure = Patch()
+    for key, array in sunburst_chart_data(selected_genre, genre_limit, expanded_genre).items():
+        patched_figure['data'][0][key] = array
+    patched_figure['data'][0]['level'] = expanded_genre or ''
+    return patched_figure
 
-# Callback for Collaboration Graph
+# Dropdown and slider changes only replace the sunburst's data arrays, and
+# collapse any expanded genre
+@app.callback(
+    [Output('sunburst-chart', 'figure'),
+     Output('sunburst-expanded-genre', 'data')],
+    [Input('genre-dropdown', 'value'),
+     Input('genre-limit-slider', 'value')],
+    prevent_initial_call=True
+)
+@superseding('sunburst-chart.figure')
+@traced('update_sunburst_chart')
+def update_sunburst_chart(selected_genre, genre_limit):
+    return sunburst_patch(selected_genre, genre_limit, None), None
+
+# Clicking a genre loads its artists beyond the top SUNBURST_TOP_ARTISTS;
+# clicking it again (the center of the zoomed view) collapses it
 @app.callback(
-    Output('collaboration-graph', 'figure'),
-    [Input('popularity-filter', 'value'),
-     Input('reach-filter', 'value')]
+    [Output('sunburst-chart', 'figure', allow_duplicate=True),
+     Output('sunburst-expanded-genre', 'data', allow_duplicate=True)],
+    Input('sunburst-chart', 'clickData'),
+    [State('genre-dropdown', 'value'),
+     State('genre-limit-slider', 'value'),
+     State('sunburst-expanded-genre', 'data')],
+    prevent_initial_call=True
 )
-def update_collaboration_graph(popularity_range, reach_range):
-    # Filter nodes based on the sliders
-    filtered_nodes = [node for node, attr in G.nodes(data=True)
-                      if popularity_range[0] <= attr['popularity'] <= popularity_range[1]
-                      and reach_range[0] <= attr['reach'] <= reach_range[1]]
-
-    # Subgraph with filtered nodes
-    filtered_G = G.subgraph(filtered_nodes)
-
-    # Extract node attributes
-    node_x = [G.nodes[node]['popularity'] for node in filtered_G.nodes]
-    node_y = [G.nodes[node]['reach'] for node in filtered_G.nodes]
-    node_size = [G.nodes[node]['popularity'] for node in filtered_G.nodes]
-    node_color = [
-        '#62d089' if G.nodes[node]['popularity'] > 75 else
-        '#457e59' if G.nodes[node]['popularity'] > 50 else
-        '#a8b2a8'
-        for node in filtered_G.nodes
+@superseding('sunburst-chart.drill')
+@traced('drill_sunburst_chart')
+def drill_sunburst_chart(click_data, selected_genre, genre_limit, expanded_genre):
+    points = (click_data or {}).get('points') or [{}]
+    genre = points[0].get('id')
+    # Artists and "Other" nodes don't expand
+    if genre not in genre_artist_cube().genre_rank:
+        raise PreventUpdate
+    checkpoint()
+    genre = None if genre == expanded_genre else genre
+    return sunburst_patch(selected_genre, genre_limit, genre), genre
+
+
+# Layout choices; the force-directed one is disabled until it has been computed
+def collaboration_layout_options():
+    ready = layout_service.get(collaboration_layout_key) is not None
+    return [
+        {'label': 'Popularity / reach', 'value': 'scores'},
+        {'label': 'Network structure' if ready else 'Network structure (computing...)',
+         'value': 'force', 'disabled': not ready},
     ]
 
-    # Extract edge coordinates
-    edge_x, edge_y = [], []
-    for edge in filtered_G.edges():
-        x0, y0 = G.nodes[edge[0]]['popularity'], G.nodes[edge[0]]['reach']
-        x1, y1 = G.nodes[edge[1]]['popularity'], G.nodes[edge[1]]['reach']
-        edge_x.extend([x0, x1, None])
-        edge_y.extend([y0, y1, None])
-
-    # Create the updated Plotly figure
+# Snap both RangeSliders onto their step grids (same bounds as the sliders).
+# Until the force-directed layout exists, it falls back to popularity/reach;
+# unknown metrics fall back to popularity.
+def normalize_collaboration_inputs(popularity_range, reach_range, layout_mode, color_metric, size_metric):
+    if layout_mode != 'force' or layout_service.get(collaboration_layout_key) is None:
+        layout_mode = 'scores'
+    return (
+        quantize_range(popularity_range, 10, 100, 5), quantize_range(reach_range, 1, REACH_MAX, 1), layout_mode,
+        color_metric if color_metric in NODE_COLOR_METRICS else 'popularity',
+        size_metric if size_metric in NODE_SIZE_METRICS else 'popularity',
+    )
+
+# Marker colors of `node_ids` and, for continuous metrics, the (cmin, cmax)
+# of the colorscale. Popularity keeps its three green bands; degree and
+# PageRank use the range over all nodes, so colors don't shift while filtering.
+def collaboration_node_colors(metric, node_ids):
+    index = collaboration_index
+    if metric == 'community':
+        palette = np.array(COMMUNITY_COLORS, dtype=object)
+        return palette[index.community[node_ids] % len(palette)], None
+    if metric in ('reach', 'pagerank'):
+        values = getattr(index, metric)
+        return values[node_ids], (float(values.min()), float(values.max()))
+    popularity = index.popularity[node_ids]
+    return np.select([popularity > 75, popularity > 50], ['#62d089', '#457e59'], default='#a8b2a8'), None
+
+# Marker sizes of `node_ids`: popularity as is (10-100), other metrics scaled
+# onto the same range
+def collaboration_node_sizes(metric, node_ids):
+    index = collaboration_index
+    if metric in ('reach', 'pagerank'):
+        values = getattr(index, metric)
+        low, high = float(values.min()), float(values.max())
+        return 10 + 90 * (values[node_ids] - low) / ((high - low) or 1)
+    return index.popularity[node_ids]
+
+# Build the collaboration network figure from already-filtered nodes and edges.
+# With `node_scores` (popularity, reach), positions come from the network
+# layout: the scores are shown on hover and the axes are hidden.
+@staged('build_figure')
+def create_collaboration_figure(node_x, node_y, node_size, node_color, node_text, edge_x, edge_y,
+                                node_scores=None, color_range=None):
     fig = go.Figure()
 
+    # WebGL keeps large graphs responsive in the browser
+    scatter = go.Scattergl if len(node_x) > SCATTERGL_THRESHOLD else go.Scatter
+
     # Add edges
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=edge_x, y=edge_y,
         line=dict(width=0.5, color='#232723'),
         hoverinfo='none',
@@ -727,7 +986,7 @@ def update_collaboration_graph(popularity_range, reach_range):
     ))
 
     # Add nodes
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=node_x, y=node_y,
         mode='markers',
         marker=dict(
@@ -735,9 +994,17 @@ def update_collaboration_graph(popularity_range, reach_range):
             color=node_color,
             line=dict(color='#e1ece3', width=1)
         ),
-        text=[f"Artist: {node}, Popularity: {G.nodes[node]['popularity']}, Reach: {G.nodes[node]['reach']}" for node in filtered_G.nodes],
-        hoverinfo='text'
+        text=node_text,
+        hovertemplate="Artist: %{text}, Popularity: %{x}, Reach: %{y}<extra></extra>"
     ))
+    if color_range is not None:
+        fig.update_traces(selector=1, marker=dict(colorscale='Greens', cmin=color_range[0], cmax=color_range[1]))
+    if node_scores is not None:
+        fig.update_traces(
+            selector=1,
+            customdata=np.column_stack(node_scores),
+            hovertemplate="Artist: %{text}, Popularity: %{customdata[0]}, Reach: %{customdata[1]}<extra></extra>"
+        )
 
     # Update layout with proper axes
     fig.update_layout(
@@ -757,31 +1024,278 @@ def update_collaboration_graph(popularity_range, reach_range):
             zeroline=False
         ),
         yaxis=dict(
-            title='Collaboration Reach (Connections 1-50)',
-            range=[1, 50],
+            title=f'Collaboration Reach (Collaborators 1-{REACH_MAX})',
+            range=[0, REACH_MAX + 1],
             titlefont=dict(color='#e1ece3', size=14),
             showgrid=False,
             zeroline=False
         )
     )
+    if node_scores is not None:
+        fig.update_xaxes(visible=False, range=None)
+        fig.update_yaxes(visible=False, range=None)
 
     return fig
 
+# Callback for Collaboration Graph
+@cached_callback('collaborations', normalize=normalize_collaboration_inputs)
+def update_collaboration_graph(popularity_range, reach_range, layout_mode, color_metric, size_metric):
+    index = collaboration_index
+    checkpoint()
+
+    # Nodes inside both slider ranges (range index lookup) and the edges
+    # between them (vectorized mask over the edge arrays)
+    with span('aggregate'):
+        node_ids, edge_ids = index.filter(popularity_range, reach_range)
+    checkpoint()
+
+    # Extract node attributes (all precomputed when the index was built)
+    node_x = index.popularity[node_ids]
+    node_y = index.reach[node_ids]
+    node_color, color_range = collaboration_node_colors(color_metric, node_ids)
+    node_size = collaboration_node_sizes(size_metric, node_ids)
+    checkpoint()
+
+    if layout_mode == 'force':
+        # Cached force-directed positions, filtered like the scores
+        positions = layout_service.get(collaboration_layout_key)
+        edge_x, edge_y = index.edge_coordinates(edge_ids, positions[:, 0], positions[:, 1])
+        return create_collaboration_figure(
+            positions[node_ids, 0], positions[node_ids, 1], node_size, node_color, index.names[node_ids],
+            edge_x, edge_y, node_scores=(node_x, node_y), color_range=color_range
+        )
+
+    # Extract edge coordinates
+    edge_x, edge_y = index.edge_coordinates(edge_ids, index.popularity, index.reach)
+
+    return create_collaboration_figure(
+        node_x, node_y, node_size, node_color, index.names[node_ids], edge_x, edge_y,
+        color_range=color_range
+    )
+
+# Node attributes, edge list and an empty figure template shipped to the
+# browser once, for the clientside filtering mode (assets/collaboration.js)
+def build_collaboration_store():
+    index = collaboration_index
+    figure, _ = serialize_output(create_collaboration_figure([], [], [], [], [], [], []))
+    return {
+        'nodes': {
+            'name': index.names.tolist(),
+            'popularity': index.popularity.tolist(),
+            'reach': index.reach.tolist(),
+            'pagerank': np.round(index.pagerank, 8).tolist(),
+            'community': index.community.tolist(),
+        },
+        # Ranges of the continuous metrics over all nodes, for colors and sizes
+        'ranges': {
+            metric: [float(getattr(index, metric).min()), float(getattr(index, metric).max())]
+            for metric in ('reach', 'pagerank')
+        },
+        'community_colors': list(COMMUNITY_COLORS),
+        'edges': {
+            'source': index.sources.tolist(),
+            'target': index.targets.tolist(),
+        },
+        'figure': figure,
+        'scattergl_threshold': SCATTERGL_THRESHOLD,
+    }
+
+collaboration_store = build_collaboration_store() if COLLABORATION_FILTERING == 'client' else None
+
+if COLLABORATION_FILTERING == 'client':
+    # Slider drags are filtered in the browser and never reach the server
+    app.clientside_callback(
+        ClientsideFunction(namespace='collaboration', function_name='filterGraph'),
+        Output('collaboration-graph', 'figure'),
+        [Input('popularity-filter', 'value'),
+         Input('reach-filter', 'value'),
+         Input('collaboration-color', 'value'),
+         Input('collaboration-size', 'value')],
+        State('collaboration-data', 'data')
+    )
+else:
+    app.callback(
+        Output('collaboration-graph', 'figure'),
+        [Input('popularity-filter', 'value'),
+         Input('reach-filter', 'value'),
+         Input('collaboration-layout', 'value'),
+         Input('collaboration-color', 'value'),
+         Input('collaboration-size', 'value')]
+    )(superseding('collaboration-graph.figure')(traced('update_collaboration_graph')(update_collaboration_graph)))
+
+    # Enable the force-directed layout choice once its background computation is done
+    @app.callback(
+        [Output('collaboration-layout', 'options'),
+         Output('collaboration-layout-poll', 'disabled')],
+        Input('collaboration-layout-poll', 'n_intervals')
+    )
+    @traced('update_collaboration_layout_options')
+    def update_collaboration_layout_options(n_intervals):
+        ensure_collaboration_layout()
+        options = collaboration_layout_options()
+        return options, not options[1]['disabled']
+
+# Callback for Radar Chart genre selection: only the traces of genres added or
+# removed are sent, as a partial update of the figure already in the browser
+@app.callback(
+    [Output('radar-chart', 'figure'),
+     Output('radar-genres-shown', 'data')],
+    Input('radar-genre-select', 'value'),
+    State('radar-genres-shown', 'data'),
+    prevent_initial_call=True
+)
+@traced('update_radar_chart')
+def update_radar_chart(selected_genres, shown_genres):
+    known_genres = genre_feature_means().index
+    selected_genres = [genre for genre in (selected_genres or []) if genre in known_genres]
+    shown_genres = shown_genres or []
+
+    patched_figure = Patch()
+
+    # Remove deselected genres, last trace first so earlier indices stay valid
+    for i in reversed(range(len(shown_genres))):
+        if shown_genres[i] not in selected_genres:
+            del patched_figure['data'][i]
+    kept_genres = [genre for genre in shown_genres if genre in selected_genres]
+
+    # Append newly selected genres
+    added_genres = [genre for genre in selected_genres if genre not in kept_genres]
+    for genre in added_genres:
+        patched_figure['data'].append(compact_trace(create_radar_trace(genre)))
+
+    return patched_figure, kept_genres + added_genres
+
+def clicked_point(click_data):
+    points = (click_data or {}).get('points') or [{}]
+    return points[0]
+
+# Typeahead: the most popular titles and artists matching what is typed, from
+# the search index (see search_index.py). Option values are "kind:text".
+@app.callback(
+    Output('track-search', 'options'),
+    Input('track-search', 'search_value'),
+    State('track-search', 'value'),
+    prevent_initial_call=True
+)
+@traced('search_tracks')
+def search_tracks(search_value, value):
+    if not search_value:
+        raise PreventUpdate
+    options = [
+        # The index already matched the query: keep the options through the
+        # dropdown's own filtering
+        {'label': f"{text} ({kind}, {popularity})", 'value': f"{kind}:{text}", 'search': search_value}
+        for text, kind, popularity in search_index().search(search_value, SEARCH_RESULTS)
+    ]
+    # The dropdown drops the label of a selected value missing from its options
+    if value and value not in [option['value'] for option in options]:
+        options.append({'label': value.split(':', 1)[1], 'value': value, 'search': search_value})
+    return options
+
+# Pick the tracks to list: a genre clicked in the tree map or radar chart, the
+# first artist of a track clicked in the table, or a searched title or artist
+@app.callback(
+    [Output('track-drill', 'data'),
+     Output('track-table', 'page_current')],
+    [Input('genre-treemap', 'clickData'),
+     Input('radar-chart', 'clickData'),
+     Input('track-table', 'active_cell'),
+     Input('track-search', 'value')],
+    [State('radar-genres-shown', 'data'),
+     State('track-table', 'data')],
+    prevent_initial_call=True
+)
+@traced('select_track_drill')
+def select_track_drill(treemap_click, radar_click, active_cell, searched, radar_genres, table_rows):
+    trigger = dash.ctx.triggered_id
+    if trigger == 'track-search':
+        if not searched:
+            raise PreventUpdate
+        kind, key = searched.split(':', 1)
+        return {'kind': kind, 'key': key}, 0
+    if trigger == 'genre-treemap':
+        genre = clicked_point(treemap_click).get('label')
+        if genre is None:
+            raise PreventUpdate
+        return {'kind': 'genre', 'key': genre}, 0
+    if trigger == 'radar-chart':
+        # Radar traces are drawn in the order of the shown genres
+        curve = clicked_point(radar_click).get('curveNumber')
+        if curve is None or curve >= len(radar_genres or []):
+            raise PreventUpdate
+        return {'kind': 'genre', 'key': radar_genres[curve]}, 0
+    if active_cell and active_cell.get('column_id') == 'artists' and active_cell['row'] < len(table_rows or []):
+        artist = re.split(ARTIST_SEPARATORS, table_rows[active_cell['row']]['artists'])[0]
+        return {'kind': 'artist', 'key': artist}, 0
+    raise PreventUpdate
+
+# One page of the selected tracks, most popular first, straight from the
+# track inverted indexes: a slice and a gather, no DataFrame filtering
+@app.callback(
+    [Output('track-table', 'data'),
+     Output('track-table', 'page_count'),
+     Output('track-table-title', 'children')],
+    [Input('track-drill', 'data'),
+     Input('track-table', 'page_current')],
+    prevent_initial_call=True
+)
+@traced('update_track_table')
+def update_track_table(drill, page_current):
+    if not drill:
+        raise PreventUpdate
+    index = track_index()
+    count = index.count(drill['kind'], drill['key'])
+    rows = index.page(drill['kind'], drill['key'], page_current or 0, TRACK_PAGE_SIZE)
+    title = {
+        'genre': f"Tracks in {drill['key']}",
+        'artist': f"Tracks by {drill['key']}",
+        'title': f"Tracks titled {drill['key']}",
+    }[drill['kind']] + f" ({count:,})"
+    return rows, max(1, -(-count // TRACK_PAGE_SIZE)), title
+
+# Page renderers by route, with the datasets each page reads
+PAGE_RENDERERS = {
+    '/artists': (render_artists_page, ('spotify_tracks', 'spotify_dataset', 'collaborations')),
+    '/user-behavior': (render_user_behavior_page, ('user_behavior',)),
+    '/genre-popularity': (render_genre_popularity_page, ('spotify_dataset',)),
+}
+
 # Callback for Page Navigation
 @app.callback(
     Output('page-content', 'children'),
     Input('url', 'pathname')
 )
+@traced('display_page')
 def display_page(pathname):
-    if pathname == '/artists':
-        return render_artists_page()
-    elif pathname == '/user-behavior':
-        return render_user_behavior_page()
-    elif pathname == '/genre-popularity':  # Add this new route
-        return render_genre_popularity_page()
-    else:  # Default to landing page
-        return render_landing_page()
-
-# Run app
+    # Layouts are cached per route and rebuilt only when a dataset they read changes
+    renderer, datasets = PAGE_RENDERERS.get(pathname, (render_landing_page, ()))
+    return cached_layout(pathname if pathname in PAGE_RENDERERS else '/', renderer, datasets)
+
+# Build all shared state up front and return the app: datasets, precomputed
+# aggregates, word cloud images and page layouts. The production server
+# (serve.py) calls this once before forking workers, so they share it all.
+def create_app():
+    # Catalogs ingested incrementally are never loaded as a whole frame
+    for name in DATA_SOURCES:
+        if name not in INCREMENTAL_DATASETS:
+            load_dataset(name)
+    for name, size in dataset_memory().items():
+        logger.info("Dataset %s holds %.2f MiB", name, size / 2 ** 20)
+    logger.info("Process resident memory after loading the datasets: %.2f MiB (peak)", process_peak_rss() / 2 ** 20)
+    genre_artist_cube()
+    genre_feature_means()
+    track_index()
+    search_index()
+    ensure_wordcloud(title_popularity_hash(), title_popularity)
+    for route in PAGE_RENDERERS:
+        display_page(route)
+    return app
+
+# WSGI entry point, e.g. `gunicorn app:server`
+server = app.server
+
+# Run app (development server; use serve.py in production)
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    create_app()
+    app.run_server(debug=os.environ.get('DASH_DEBUG', '1') == '1')
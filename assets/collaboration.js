@@ -0,0 +1,73 @@
+// Clientside filtering for the artist collaboration network.
+// Used when the app runs with COLLABORATION_FILTERING=client: node attributes,
+// the edge list and an empty figure template are shipped once in the
+// 'collaboration-data' store, and slider changes are applied here.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    collaboration: {
+        filterGraph: function (popularityRange, reachRange, colorMetric, sizeMetric, data) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+
+            const nodes = data.nodes;
+            const keep = new Uint8Array(nodes.name.length);
+            const nodeX = [], nodeY = [], nodeSize = [], nodeColor = [], nodeText = [];
+            const continuousColor = colorMetric === 'reach' || colorMetric === 'pagerank';
+            const sizeRange = data.ranges[sizeMetric];
+
+            // Filter nodes based on the sliders
+            for (let i = 0; i < nodes.name.length; i++) {
+                const popularity = nodes.popularity[i];
+                const reach = nodes.reach[i];
+                if (popularity < popularityRange[0] || popularity > popularityRange[1] ||
+                    reach < reachRange[0] || reach > reachRange[1]) {
+                    continue;
+                }
+                keep[i] = 1;
+                nodeX.push(popularity);
+                nodeY.push(reach);
+                // Same colors and sizes as the server (see collaboration_node_colors/sizes)
+                if (continuousColor) {
+                    nodeColor.push(nodes[colorMetric][i]);
+                } else if (colorMetric === 'community') {
+                    nodeColor.push(data.community_colors[nodes.community[i] % data.community_colors.length]);
+                } else {
+                    nodeColor.push(popularity > 75 ? '#62d089' : popularity > 50 ? '#457e59' : '#a8b2a8');
+                }
+                if (sizeRange) {
+                    nodeSize.push(10 + 90 * (nodes[sizeMetric][i] - sizeRange[0]) / ((sizeRange[1] - sizeRange[0]) || 1));
+                } else {
+                    nodeSize.push(popularity);
+                }
+                nodeText.push(nodes.name[i]);
+            }
+
+            // Keep edges whose endpoints both survived the filter
+            const edgeX = [], edgeY = [];
+            const source = data.edges.source, target = data.edges.target;
+            for (let i = 0; i < source.length; i++) {
+                const u = source[i], v = target[i];
+                if (keep[u] && keep[v]) {
+                    edgeX.push(nodes.popularity[u], nodes.popularity[v], null);
+                    edgeY.push(nodes.reach[u], nodes.reach[v], null);
+                }
+            }
+
+            // Fill a copy of the server-built figure template
+            const figure = JSON.parse(JSON.stringify(data.figure));
+            Object.assign(figure.data[0], {x: edgeX, y: edgeY});
+            Object.assign(figure.data[1], {x: nodeX, y: nodeY, text: nodeText});
+            Object.assign(figure.data[1].marker, {size: nodeSize, color: nodeColor});
+            if (continuousColor) {
+                Object.assign(figure.data[1].marker, {
+                    colorscale: 'Greens', cmin: data.ranges[colorMetric][0], cmax: data.ranges[colorMetric][1]
+                });
+            }
+            if (nodeX.length > data.scattergl_threshold) {
+                figure.data.forEach(function (trace) { trace.type = 'scattergl'; });
+            }
+            return figure;
+        }
+    }
+});
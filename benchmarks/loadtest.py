@@ -0,0 +1,376 @@
+# Load test: concurrent simulated users replaying dashboard sessions
+#
+# Drives a running app over HTTP the way the Dash renderer does, with no
+# browser: each user loads the index, the layout and the callback graph,
+# then navigates between pages and plays with their controls, posting to
+# `_dash-update-component`. Like the renderer, a user fires a page's initial
+# callbacks when its layout arrives, skips clientside callbacks, and sends
+# the current value of every input and state. Sessions:
+#
+#   /artists           drag the popularity-filter / reach-filter RangeSliders,
+#                      add and remove genres on the radar chart
+#   /user-behavior     read the page
+#   /genre-popularity  step through genre-dropdown values, move the slider
+#
+# Reports throughput, error counts and p50/p95/p99 latency per callback (page
+# navigation is reported per route), optionally as JSON.
+#
+#   python serve.py --workers 4 --bind 127.0.0.1:8050 &
+#   python benchmarks/loadtest.py --url http://127.0.0.1:8050 --users 50 --duration 60
+#
+# or let the load test start (and stop) the production server itself:
+#
+#   python benchmarks/loadtest.py --serve 4 --users 50 --duration 60
+
+import os
+import sys
+import gzip
+import json
+import time
+import random
+import argparse
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+from urllib.error import URLError
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ROUTES = ['/artists', '/user-behavior', '/genre-popularity']
+
+# Props kept from layouts: values sent with callbacks plus what the
+# simulated user needs to pick new values
+SESSION_PROPS = ('value', 'data', 'options', 'min', 'max', 'step', 'multi', 'pathname')
+
+
+class LatencyLog:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+        self._bytes = {}
+
+    def record(self, name, seconds, size, error=False):
+        with self._lock:
+            self._latencies.setdefault(name, []).append(seconds)
+            self._bytes[name] = self._bytes.get(name, 0) + size
+            if error:
+                self._errors[name] = self._errors.get(name, 0) + 1
+
+    def summary(self, elapsed):
+        with self._lock:
+            names = sorted(self._latencies)
+            rows = []
+            for name in names:
+                latencies = sorted(self._latencies[name])
+                rows.append({
+                    'name': name,
+                    'requests': len(latencies),
+                    'errors': self._errors.get(name, 0),
+                    'throughput_rps': len(latencies) / elapsed,
+                    'p50_ms': percentile(latencies, 50) * 1000,
+                    'p95_ms': percentile(latencies, 95) * 1000,
+                    'p99_ms': percentile(latencies, 99) * 1000,
+                    'max_ms': latencies[-1] * 1000,
+                    'mean_kb': self._bytes[name] / len(latencies) / 1024,
+                })
+            return rows
+
+
+# Nearest-rank percentile of an already sorted list
+def percentile(values, q):
+    rank = max(int(round(q / 100 * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def _split_output(output):
+    if output.startswith('..'):
+        return [_split_output(part) for part in output[2:-2].split('...')]
+    component_id, prop = output.rsplit('.', 1)
+    return {'id': component_id, 'property': prop}
+
+
+# Components (id -> props) found anywhere in a serialized layout
+def _components(tree, found):
+    if isinstance(tree, list):
+        for item in tree:
+            _components(item, found)
+    elif isinstance(tree, dict) and 'props' in tree:
+        props = tree['props']
+        if 'id' in props:
+            found[props['id']] = {key: props[key] for key in SESSION_PROPS if key in props}
+        _components(props.get('children'), found)
+    return found
+
+
+class Session:
+    def __init__(self, base_url, log, rng, think_time):
+        url = urlsplit(base_url)
+        self.host, self.port = url.hostname, url.port or 80
+        self.prefix = url.path.rstrip('/')
+        self.log = log
+        self.rng = rng
+        self.think_time = think_time
+        self.conn = None
+        self.cookie = None  # session cookie, as a browser would send it back
+        self.props = {}  # component id -> props
+        self.callbacks = []
+
+    def _request(self, name, method, path, body=None):
+        headers = {'Accept-Encoding': 'gzip'}
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if body is not None:
+            body = json.dumps(body).encode()
+            headers['Content-Type'] = 'application/json'
+        start = time.perf_counter()
+        try:
+            if self.conn is None:
+                self.conn = http.client.HTTPConnection(self.host, self.port, timeout=120)
+            self.conn.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            payload = response.read()
+            status = response.status
+            if response.getheader('Set-Cookie'):
+                self.cookie = response.getheader('Set-Cookie').split(';', 1)[0]
+        except (OSError, http.client.HTTPException):
+            self.conn = None
+            self.log.record(name, time.perf_counter() - start, 0, error=True)
+            return None
+        self.log.record(name, time.perf_counter() - start, len(payload), error=status >= 400)
+        if status != 200:
+            return None
+        if response.getheader('Content-Encoding') == 'gzip':
+            payload = gzip.decompress(payload)
+        return payload
+
+    def _think(self):
+        if self.think_time:
+            time.sleep(self.rng.expovariate(1 / self.think_time))
+
+    def open(self):
+        self._request('GET /', 'GET', '/')
+        self._request('GET /_dash-layout', 'GET', '/_dash-layout')
+        dependencies = self._request('GET /_dash-dependencies', 'GET', '/_dash-dependencies')
+        # Clientside callbacks run in the browser and never reach the server
+        self.callbacks = [
+            callback for callback in json.loads(dependencies or b'[]')
+            if not callback.get('clientside_function')
+        ]
+        self.props = {'url': {'pathname': None}}
+
+    def _fire(self, callback, changed):
+        inputs = [
+            dict(item, value=self.props.get(item['id'], {}).get(item['property']))
+            for item in callback['inputs']
+        ]
+        name = callback['output']
+        if name == 'page-content.children':
+            name += f" {inputs[0]['value']}"
+        payload = self._request(name, 'POST', '/_dash-update-component', {
+            'output': callback['output'],
+            'outputs': _split_output(callback['output']),
+            'inputs': inputs,
+            'state': [
+                dict(item, value=self.props.get(item['id'], {}).get(item['property']))
+                for item in callback['state']
+            ],
+            'changedPropIds': changed,
+        })
+        if payload is None:
+            return
+
+        # Apply full values to the session (patches only change figures)
+        new_components = {}
+        for component_id, props in json.loads(payload).get('response', {}).items():
+            for prop, value in props.items():
+                if isinstance(value, dict) and value.get('__dash_patch_update'):
+                    continue
+                if prop == 'children':
+                    _components(value, new_components)
+                elif prop in SESSION_PROPS:
+                    self.props.setdefault(component_id, {})[prop] = value
+        if new_components:
+            self.props.update(new_components)
+            self._fire_initial(new_components)
+
+    # Callbacks the renderer runs when their inputs appear in a new layout
+    def _fire_initial(self, components):
+        for callback in self.callbacks:
+            if callback.get('prevent_initial_call'):
+                continue
+            if all(item['id'] in components for item in callback['inputs']):
+                self._fire(callback, [f"{item['id']}.{item['property']}" for item in callback['inputs']])
+
+    def set_prop(self, component_id, prop, value):
+        self.props.setdefault(component_id, {})[prop] = value
+        key = f"{component_id}.{prop}"
+        for callback in self.callbacks:
+            if any(f"{item['id']}.{item['property']}" == key for item in callback['inputs']):
+                self._fire(callback, [key])
+        self._think()
+
+    def navigate(self, route):
+        self.set_prop('url', 'pathname', route)
+
+    # Drag one handle of a RangeSlider to a new step
+    def drag_range(self, component_id):
+        props = self.props.get(component_id)
+        if not props or not isinstance(props.get('value'), list):
+            return
+        low, high = props['value']
+        step = props.get('step') or 1
+        steps = int((props['max'] - props['min']) / step)
+        position = props['min'] + self.rng.randint(0, steps) * step
+        if self.rng.random() < 0.5:
+            low = min(position, high)
+        else:
+            high = max(position, low)
+        self.set_prop(component_id, 'value', [low, high])
+
+    def move_slider(self, component_id):
+        props = self.props.get(component_id)
+        if not props:
+            return
+        step = props.get('step') or 1
+        steps = int((props['max'] - props['min']) / step)
+        self.set_prop(component_id, 'value', props['min'] + self.rng.randint(0, steps) * step)
+
+    # Select the option after the current one, as with the arrow keys
+    def step_option(self, component_id):
+        props = self.props.get(component_id)
+        if not props or not props.get('options'):
+            return
+        values = [option['value'] if isinstance(option, dict) else option for option in props['options']]
+        current = values.index(props['value']) if props.get('value') in values else -1
+        self.set_prop(component_id, 'value', values[(current + 1) % len(values)])
+
+    # Add or remove one value of a multi-select Dropdown
+    def toggle_option(self, component_id):
+        props = self.props.get(component_id)
+        if not props or not props.get('options'):
+            return
+        values = [option['value'] if isinstance(option, dict) else option for option in props['options']]
+        selected = list(props.get('value') or [])
+        value = self.rng.choice(values)
+        if value in selected and len(selected) > 1:
+            selected.remove(value)
+        elif value not in selected:
+            selected.append(value)
+        self.set_prop(component_id, 'value', selected)
+
+    def play_page(self, route):
+        self.navigate(route)
+        if route == '/artists':
+            for _ in range(self.rng.randint(2, 6)):
+                self.drag_range(self.rng.choice(['popularity-filter', 'reach-filter']))
+            for _ in range(self.rng.randint(1, 3)):
+                self.toggle_option('radar-genre-select')
+        elif route == '/genre-popularity':
+            for _ in range(self.rng.randint(3, 8)):
+                self.step_option('genre-dropdown')
+            for _ in range(self.rng.randint(1, 3)):
+                self.move_slider('genre-limit-slider')
+
+    def run(self, deadline):
+        while time.monotonic() < deadline:
+            self.open()
+            for route in self.rng.sample(ROUTES, len(ROUTES)):
+                if time.monotonic() >= deadline:
+                    break
+                self.play_page(route)
+
+
+def _wait_until_ready(base_url, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with urlopen(base_url + '/_dash-dependencies', timeout=5):
+                return True
+        except (URLError, OSError):
+            time.sleep(0.5)
+    return False
+
+
+# Start the production server (serve.py) on a local port for the test
+def start_server(workers, threads, port):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(REPO_ROOT, 'serve.py'), '--workers', str(workers),
+         '--threads', str(threads), '--bind', f"127.0.0.1:{port}"],
+        stdout=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    if not _wait_until_ready(base_url, timeout=300):
+        process.terminate()
+        raise SystemExit("The server did not start")
+    return process, base_url
+
+
+def run(base_url, users, duration, think_time, seed):
+    log = LatencyLog()
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(
+            target=Session(base_url, log, random.Random(seed + i), think_time).run,
+            args=(deadline,), daemon=True,
+        )
+        for i in range(users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return log.summary(time.perf_counter() - start)
+
+
+def print_results(rows):
+    print(f"{'request':<48} {'count':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>9} "
+          f"{'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'KB':>8}")
+    for row in rows:
+        print(f"{row['name'][:48]:<48} {row['requests']:>7} {row['errors']:>7} {row['throughput_rps']:8.1f} "
+              f"{row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['max_ms']:9.1f} "
+              f"{row['mean_kb']:8.1f}")
+    total = sum(row['throughput_rps'] for row in rows)
+    print(f"\nTotal throughput: {total:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay concurrent dashboard sessions against a running app.")
+    parser.add_argument('--url', default='http://127.0.0.1:8050', help="Base URL of the app")
+    parser.add_argument('--serve', type=int, metavar='WORKERS',
+                        help="Start serve.py with this many workers for the test")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker with --serve")
+    parser.add_argument('--port', type=int, default=8051, help="Port for --serve")
+    parser.add_argument('--users', type=int, default=20, help="Concurrent simulated users")
+    parser.add_argument('--duration', type=float, default=60, help="Test length in seconds")
+    parser.add_argument('--think-time', type=float, default=0.5,
+                        help="Mean pause between user actions in seconds (0 for none)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for the simulated sessions")
+    parser.add_argument('--output', help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url.rstrip('/')
+    if args.serve:
+        server, base_url = start_server(args.serve, args.threads, args.port)
+    try:
+        rows = run(base_url, args.users, args.duration, args.think_time, args.seed)
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print_results(rows)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'url': base_url, 'workers': args.serve, 'users': args.users,
+                'duration_s': args.duration, 'think_time_s': args.think_time, 'results': rows,
+            }, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
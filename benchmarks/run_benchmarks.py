@@ -0,0 +1,241 @@
+# Benchmarks for the dashboard's chart builders, page renderers and callbacks
+#
+# For every scale factor, synthetic datasets (see synthetic.py) are generated
+# once under .cache/benchmarks/scale-<N>/, and the benchmarks run in a fresh
+# Python process with that directory as the working directory, so the app
+# loads them through its normal code path. Each target records:
+#
+#   cold_s         wall time of the first call (output caches empty, datasets
+#                  and aggregates preloaded by create_app() as at startup)
+#   warm_s         median wall time of the following calls
+#   peak_bytes     peak Python/NumPy memory allocated during the first call
+#   payload_bytes  size of the serialized output, as sent to the browser
+#
+# Results are written to JSON, and two result files can be compared:
+#
+#   python benchmarks/run_benchmarks.py --scales 1,10,100,1000
+#   python benchmarks/run_benchmarks.py --compare before.json after.json
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime, timezone
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_WORK_DIR = os.path.join(REPO_ROOT, '.cache', 'benchmarks')
+
+# A target is a regression when it gets this much slower or bigger
+REGRESSION_THRESHOLD = 1.2
+
+
+def benchmark_targets():
+    import app
+    from aggregates import genre_artist_cube, title_popularity
+    from wordcloud_cache import generate_wordcloud
+
+    top_genre = genre_artist_cube().genres[0]
+    return [
+        ('create_treemap', app.create_treemap),
+        ('create_sunburst', app.create_sunburst),
+        ('create_polar_chart', app.create_polar_chart),
+        ('create_gauge_plot', app.create_gauge_plot),
+        ('create_circle_pack_diagram', app.create_circle_pack_diagram),
+        ('generate_wordcloud', lambda: generate_wordcloud(title_popularity()).to_image()),
+        ('render_artists_page', app.render_artists_page),
+        ('render_user_behavior_page', app.render_user_behavior_page),
+        ('render_genre_popularity_page', app.render_genre_popularity_page),
+        ('update_sunburst_chart[All,100]', lambda: app.update_sunburst_chart("All", 100)),
+        ('update_sunburst_chart[genre,100]', lambda: app.update_sunburst_chart(top_genre, 100)),
+        ('drill_sunburst_chart[All,100]', lambda: app.drill_sunburst_chart(
+            {'points': [{'id': top_genre}]}, "All", 100, None)),
+        ('update_user_behavior_charts[all]', lambda: app.update_user_behavior_charts(None, None, None, None, None)),
+        ('update_user_behavior_charts[filtered]', lambda: app.update_user_behavior_charts(
+            None, None, None, None, app.survey_index().labels['fav_music_genre'][:2].tolist())),
+        ('update_track_table[genre,page 0]', lambda: app.update_track_table({'kind': 'genre', 'key': top_genre}, 0)),
+        ('update_track_table[genre,page 2]', lambda: app.update_track_table({'kind': 'genre', 'key': top_genre}, 2)),
+        ('search_tracks[short]', lambda: app.search_tracks("a", None)),
+        ('search_tracks[words]', lambda: app.search_tracks("the lo", None)),
+        ('update_collaboration_graph[full]', lambda: app.update_collaboration_graph(
+            [10, 100], [1, app.REACH_MAX], 'scores', 'popularity', 'popularity')),
+        ('update_collaboration_graph[narrow]', lambda: app.update_collaboration_graph(
+            [40, 60], [2, 10], 'scores', 'popularity', 'popularity')),
+        ('update_collaboration_graph[metrics]', lambda: app.update_collaboration_graph(
+            [10, 100], [1, app.REACH_MAX], 'scores', 'community', 'pagerank')),
+    ]
+
+
+def _payload_bytes(value):
+    from PIL import Image
+    from plotly.io.json import to_json_plotly
+    from serialization import serialize_output
+
+    if isinstance(value, Image.Image):
+        return None
+    return len(to_json_plotly(serialize_output(value)[0]))
+
+
+def measure(func, repeats):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    cold = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    warm = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        warm.append(time.perf_counter() - start)
+
+    return {
+        'cold_s': cold,
+        'warm_s': statistics.median(warm) if warm else None,
+        'peak_bytes': peak,
+        'payload_bytes': _payload_bytes(result),
+    }
+
+
+# Runs inside the data directory of one scale; prints results as JSON
+def run_worker(scale, repeats):
+    sys.path.insert(0, REPO_ROOT)
+
+    # Startup (importing the app, then create_app() loading the datasets and
+    # building the aggregates and page layouts) is a benchmark of its own
+    tracemalloc.start()
+    start = time.perf_counter()
+    import app
+    app.create_app()
+    startup_time = time.perf_counter() - start
+    _, startup_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # The targets' first calls still build their outputs, on the preloaded data
+    app.figure_cache.clear()
+    app.layout_cache.clear()
+
+    results = [{
+        'scale': scale, 'name': 'create_app', 'cold_s': startup_time,
+        'warm_s': None, 'peak_bytes': startup_peak, 'payload_bytes': None,
+    }]
+    for name, func in benchmark_targets():
+        results.append(dict(scale=scale, name=name, **measure(func, repeats)))
+    json.dump(results, sys.stdout)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(scale, work_dir, repeats, regenerate):
+    from synthetic import generate_datasets
+
+    data_dir = os.path.join(work_dir, f"scale-{scale}")
+    if regenerate or not os.path.exists(os.path.join(data_dir, 'simulated_collaborations.csv')):
+        print(f"Generating synthetic data at {scale}x ...", file=sys.stderr)
+        generate_datasets(data_dir, scale)
+
+    # Start every run with empty on-disk caches
+    cache_dir = os.path.join(data_dir, '.cache')
+    shutil.rmtree(cache_dir, ignore_errors=True)
+
+    print(f"Running benchmarks at {scale}x ...", file=sys.stderr)
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--worker', '--scale', str(scale), '--repeats', str(repeats)],
+        cwd=data_dir,
+        env=dict(os.environ, SPOTIFY_CACHE_DIR=cache_dir),
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def print_results(results):
+    print(f"{'scale':>6}  {'benchmark':<36} {'cold ms':>10} {'warm ms':>10} {'peak MB':>9} {'payload KB':>11}")
+    for row in results:
+        warm = f"{row['warm_s'] * 1000:10.2f}" if row['warm_s'] is not None else f"{'-':>10}"
+        payload = f"{row['payload_bytes'] / 1024:11.1f}" if row['payload_bytes'] is not None else f"{'-':>11}"
+        print(f"{row['scale']:>5}x  {row['name']:<36} {row['cold_s'] * 1000:10.2f} {warm} "
+              f"{row['peak_bytes'] / 2 ** 20:9.1f} {payload}")
+
+
+# Print the change of every metric between two result files; returns the
+# number of regressions found
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = {(r['scale'], r['name']): r for r in json.load(f)['results']}
+    with open(after_path) as f:
+        after = json.load(f)['results']
+
+    regressions = 0
+    metrics = ('cold_s', 'warm_s', 'peak_bytes', 'payload_bytes')
+    print(f"{'scale':>6}  {'benchmark':<36} " + ' '.join(f"{m:>14}" for m in metrics))
+    for row in after:
+        old = before.get((row['scale'], row['name']))
+        if old is None:
+            continue
+        cells = []
+        for metric in metrics:
+            if not old[metric] or row[metric] is None:
+                cells.append(f"{'-':>14}")
+                continue
+            ratio = row[metric] / old[metric]
+            flag = ' !' if ratio > REGRESSION_THRESHOLD else '  '
+            regressions += ratio > REGRESSION_THRESHOLD
+            cells.append(f"{ratio:11.2f}x{flag}")
+        print(f"{row['scale']:>5}x  {row['name']:<36} " + ' '.join(cells))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard on synthetic data.")
+    parser.add_argument('--scales', default='1,10,100,1000', help="Comma-separated scale factors")
+    parser.add_argument('--repeats', type=int, default=5, help="Warm calls per benchmark")
+    parser.add_argument('--work-dir', default=DEFAULT_WORK_DIR, help="Where synthetic data is kept")
+    parser.add_argument('--output', help="Results file (default: <work-dir>/results-<commit>.json)")
+    parser.add_argument('--regenerate', action='store_true', help="Regenerate synthetic data")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help="Compare two result files")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--scale', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.scale, args.repeats)
+        return
+    if args.compare:
+        sys.exit(1 if compare(*args.compare) else 0)
+
+    results = []
+    for scale in (int(s) for s in args.scales.split(',')):
+        results.extend(run_scale(scale, args.work_dir, args.repeats, args.regenerate))
+
+    commit = _git_commit()
+    output = args.output or os.path.join(args.work_dir, f"results-{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump({
+            'commit': commit,
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'results': results,
+        }, f, indent=2)
+
+    print_results(results)
+    print(f"\nResults written to {output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
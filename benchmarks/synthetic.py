@@ -0,0 +1,114 @@
+# Synthetic datasets with the same schemas as the dashboard's inputs
+#
+# Scale 1 matches the size of the bundled data (6,300 catalog tracks, 520
+# survey responses, 50 collaborations); every row count grows linearly with
+# the scale factor. Genre and category vocabularies stay fixed, as they would
+# in a real catalog. Generation is seeded, so a given scale always produces
+# the same files.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+BASE_TRACKS = 6300
+BASE_SURVEY_RESPONSES = 520
+BASE_COLLABORATIONS = 50
+
+GENRE_COUNT = 114
+RADAR_ATTRIBUTES = ['danceability', 'energy', 'acousticness', 'speechiness', 'liveness']
+
+SURVEY_CATEGORIES = {
+    'Age': ['6-12', '12-20', '20-35', '35-60', '60+'],
+    'Gender': ['Female', 'Male', 'Others'],
+    'spotify_subscription_plan': ['Free (ad-supported)', 'Premium (paid subscription)'],
+    'premium_sub_willingness': ['Yes', 'No'],
+    'music_time_slot': ['Morning', 'Afternoon', 'Night'],
+    'fav_music_genre': ['Melody', 'Pop', 'Rap', 'Rock', 'Classical', 'Electronic/Dance',
+                        'All', 'Kpop', 'Trending songs random', 'Old songs', 'classical melody'],
+    'pod_variety_satisfaction': ['Very Dissatisfied', 'Dissatisfied', 'Ok', 'Satisfied', 'Very Satisfied'],
+}
+
+_SYLLABLES = ['la', 'mo', 'ri', 'ka', 'zen', 'lu', 'tor', 'vi', 'sa', 'ne', 'do', 'mi',
+              'ra', 'shi', 'bo', 'el', 'an', 'qu', 'fi', 'ro']
+
+
+def _words(rng, count, syllables=(2, 3)):
+    lengths = rng.integers(syllables[0], syllables[1] + 1, count)
+    picks = rng.integers(0, len(_SYLLABLES), (count, syllables[1]))
+    return [
+        ''.join(_SYLLABLES[p] for p in row[:length]).capitalize()
+        for row, length in zip(picks, lengths)
+    ]
+
+
+def _catalog(rng, rows):
+    genres = [f"genre-{i:03d}" for i in range(GENRE_COUNT)]
+    vocabulary = np.array(_words(rng, 2000))
+    artists = np.array([f"{first} {last}" for first, last in zip(
+        _words(rng, max(rows // 5, 10)), _words(rng, max(rows // 5, 10))
+    )])
+
+    # Skewed genre and artist frequencies, like a real catalog
+    genre_ids = np.minimum(rng.zipf(1.3, rows) - 1, GENRE_COUNT - 1)
+    artist_ids = np.minimum(rng.zipf(1.2, rows) - 1, len(artists) - 1)
+    title_words = vocabulary[rng.integers(0, len(vocabulary), (rows, 2))]
+
+    return pd.DataFrame({
+        'id': [f"T{i:09d}" for i in range(rows)],
+        'name': np.char.add(np.char.add(title_words[:, 0], ' '), title_words[:, 1]),
+        'genre': np.array(genres)[genre_ids],
+        'artists': artists[artist_ids],
+        'popularity': rng.integers(0, 101, rows),
+        'duration_ms': rng.integers(90_000, 400_000, rows),
+        'explicit': rng.random(rows) < 0.2,
+    })
+
+
+def _tracks(rng, catalog):
+    tracks = pd.DataFrame({
+        'track_id': catalog['id'],
+        'artists': catalog['artists'],
+        'track_name': catalog['name'],
+        'popularity': catalog['popularity'],
+        'duration_ms': catalog['duration_ms'],
+        'explicit': catalog['explicit'],
+    })
+    for attribute in RADAR_ATTRIBUTES:
+        tracks[attribute] = rng.random(len(catalog)).round(4)
+    tracks['track_genre'] = catalog['genre']
+    return tracks
+
+
+def _survey(rng, rows):
+    survey = pd.DataFrame({
+        column: np.array(values)[rng.integers(0, len(values), rows)]
+        for column, values in SURVEY_CATEGORIES.items()
+    })
+    survey['music_recc_rating'] = rng.integers(1, 6, rows)
+    return survey
+
+
+def _collaborations(rng, edges):
+    artists = np.array([f"{first} {last}" for first, last in zip(
+        _words(rng, 2 * edges), _words(rng, 2 * edges)
+    )])
+    ends = rng.integers(0, len(artists), (edges, 2))
+    return pd.DataFrame({'Artist_A': artists[ends[:, 0]], 'Artist_B': artists[ends[:, 1]]})
+
+
+# Write every dataset for `scale` under `directory`, laid out as the app
+# expects (Data/... and simulated_collaborations.csv)
+def generate_datasets(directory, scale, seed=0):
+    rng = np.random.default_rng(seed)
+    os.makedirs(os.path.join(directory, 'Data'), exist_ok=True)
+
+    catalog = _catalog(rng, BASE_TRACKS * scale)
+    catalog.to_csv(os.path.join(directory, 'Data', 'spotify_dataset.csv'), index=False)
+    _tracks(rng, catalog).to_csv(os.path.join(directory, 'Data', 'spotify_tracks_dataset.csv'), index=False)
+    _survey(rng, BASE_SURVEY_RESPONSES * scale).to_excel(
+        os.path.join(directory, 'Data', 'Spotify_User_Behavior_Dataset.xlsx'), index=False, sheet_name='Sheet1'
+    )
+    _collaborations(rng, BASE_COLLABORATIONS * scale).to_csv(
+        os.path.join(directory, 'simulated_collaborations.csv'), index=False
+    )
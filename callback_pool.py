@@ -0,0 +1,153 @@
+# Bounded, superseding execution of slow callbacks
+#
+# Dragging a slider fires a stream of requests for the same output, and each
+# used to run to completion on its request thread even after the user had
+# moved on. Callbacks wrapped with `superseding(output)` run instead on a
+# shared pool of CALLBACK_WORKERS threads per process, and each browser
+# session (the CALLBACK_SESSION_COOKIE cookie, set on its first response)
+# only keeps its newest request per output:
+#
+# - an older request still queued is cancelled and never starts;
+# - an older request already running stops at its next `checkpoint()`,
+#   which callbacks call between their stages.
+#
+# Superseded requests answer with no update (HTTP 204) as soon as they are
+# superseded, freeing their request thread while the pool thread runs on to
+# its next checkpoint, and the browser keeps the newer result. The queue
+# therefore holds at most one request per session and output, so stale work
+# can't pile up in front of fresh work under load.
+# Supersession is per process: requests of one session served by different
+# gunicorn workers don't supersede each other.
+
+import os
+import uuid
+import functools
+import threading
+import contextvars
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+from dash.exceptions import PreventUpdate
+from flask import g, has_request_context, request
+
+# Threads per process running superseding callbacks; defaults to the request
+# threads of a gunicorn worker (set by serve.py)
+CALLBACK_WORKERS = int(os.environ.get('CALLBACK_WORKERS') or os.environ.get('GUNICORN_THREADS') or 4)
+
+CALLBACK_SESSION_COOKIE = 'dashboard_session'
+
+_local = threading.local()
+
+
+class Superseded(Exception):
+    pass
+
+
+# What a waiting request thread wakes up on: its callback finishing, or a
+# newer request superseding it
+class _Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.superseded = False
+
+    def supersede(self):
+        self.superseded = True
+        self.event.set()
+
+
+class CallbackPool:
+    def __init__(self, workers=CALLBACK_WORKERS):
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = None
+        self._latest = {}  # (session, output) -> (generation, Future, _Waiter)
+        self._generation = 0
+
+    def _executor(self):
+        if self._pid != os.getpid():
+            # Threads don't survive a fork: each gunicorn worker starts its own pool
+            self._pid, self._pool, self._latest = os.getpid(), None, {}
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='callback')
+        return self._pool
+
+    def is_current(self, key, generation):
+        with self._lock:
+            entry = self._latest.get(key)
+            return entry is not None and entry[0] == generation
+
+    def _run(self, key, generation, func, args, kwargs):
+        if not self.is_current(key, generation):
+            raise Superseded()
+        _local.ticket = (self, key, generation)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _local.ticket = None
+            with self._lock:
+                if self._latest.get(key, (None,))[0] == generation:
+                    del self._latest[key]
+
+    # Run `func` on the pool as the newest request of `key`, superseding (and
+    # cancelling, if it hasn't started) the previous one; blocks until done,
+    # or raises Superseded as soon as a newer request of `key` arrives
+    def run(self, key, func, *args, **kwargs):
+        # Copy the request's context (Flask request, Dash callback context) to the pool thread
+        context = contextvars.copy_context()
+        waiter = _Waiter()
+        with self._lock:
+            executor = self._executor()
+            self._generation += 1
+            generation = self._generation
+            previous = self._latest.get(key)
+            future = executor.submit(context.run, self._run, key, generation, func, args, kwargs)
+            self._latest[key] = (generation, future, waiter)
+        future.add_done_callback(lambda _: waiter.event.set())
+        if previous is not None:
+            previous[1].cancel()
+            previous[2].supersede()
+        waiter.event.wait()
+        if waiter.superseded:
+            raise Superseded()
+        return future.result()
+
+
+callback_pool = CallbackPool()
+
+
+# Stop the calling callback if a newer request for its output has arrived;
+# a no-op outside superseding callbacks
+def checkpoint():
+    ticket = getattr(_local, 'ticket', None)
+    if ticket is not None and not ticket[0].is_current(ticket[1], ticket[2]):
+        raise Superseded()
+
+
+# Run a callback on the pool, superseded by newer requests of the same
+# session for `output`. Outside a request (e.g. in benchmarks) it runs inline.
+def superseding(output, pool=callback_pool):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not has_request_context():
+                return func(*args, **kwargs)
+            try:
+                return pool.run((g.get('callback_session'), output), func, *args, **kwargs)
+            except (Superseded, CancelledError):
+                raise PreventUpdate
+        return wrapper
+    return decorator
+
+
+# Give every browser session an id, in a cookie, to tell its requests apart
+def install_callback_sessions(server):
+    @server.before_request
+    def assign_callback_session():
+        g.callback_session = request.cookies.get(CALLBACK_SESSION_COOKIE) or uuid.uuid4().hex
+
+    @server.after_request
+    def set_callback_session(response):
+        session = g.get('callback_session')
+        if session is not None and request.cookies.get(CALLBACK_SESSION_COOKIE) != session:
+            response.set_cookie(CALLBACK_SESSION_COOKIE, session, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,211 @@
+# Array-backed artist collaboration network
+#
+# Node attributes live in NumPy arrays indexed by integer node id and edges are
+# stored as two id arrays, so filtering by the popularity/reach sliders and
+# extracting edge coordinates are vectorized operations instead of Python
+# loops over a networkx graph. Neighborhoods are held as a CSR adjacency, over
+# which degree, PageRank and label-propagation communities are computed in
+# batch when the index is built.
+
+import numpy as np
+import pandas as pd
+
+
+# Bucketed 2D grid over (popularity, reach).
+#
+# Node ids are sorted by grid cell (row-major: popularity bucket, then reach
+# bucket), with cell_offsets[c]:cell_offsets[c + 1] holding the nodes of cell c.
+# A range query touches one contiguous run of cells per popularity bucket, and
+# only the candidates from those runs are checked against the exact bounds.
+class GridRangeIndex:
+    def __init__(self, x, y, cell_width=(5, 1)):
+        self.x = x
+        self.y = y
+        self.x_min = int(x.min()) if len(x) else 0
+        self.y_min = int(y.min()) if len(y) else 0
+        self.x_width, self.y_width = cell_width
+        self.x_cells = int((x.max() - self.x_min) // self.x_width) + 1 if len(x) else 1
+        self.y_cells = int((y.max() - self.y_min) // self.y_width) + 1 if len(y) else 1
+
+        cells = self._cell_x(x) * self.y_cells + self._cell_y(y)
+        self.order = np.argsort(cells, kind='stable').astype(np.int64)
+        counts = np.bincount(cells, minlength=self.x_cells * self.y_cells)
+        self.cell_offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def _cell_x(self, x):
+        return (np.asarray(x, dtype=np.int64) - self.x_min) // self.x_width
+
+    def _cell_y(self, y):
+        return (np.asarray(y, dtype=np.int64) - self.y_min) // self.y_width
+
+    # Ids of the nodes with x_range[0] <= x <= x_range[1] and y_range[0] <= y <= y_range[1],
+    # in ascending id order
+    def query(self, x_range, y_range):
+        if x_range[1] < self.x_min or y_range[1] < self.y_min:
+            return np.empty(0, dtype=np.int64)
+        x_lo, x_hi = (int(np.clip(c, 0, self.x_cells - 1)) for c in self._cell_x(x_range))
+        y_lo, y_hi = (int(np.clip(c, 0, self.y_cells - 1)) for c in self._cell_y(y_range))
+
+        runs = [
+            self.order[self.cell_offsets[row * self.y_cells + y_lo]:self.cell_offsets[row * self.y_cells + y_hi + 1]]
+            for row in range(x_lo, x_hi + 1)
+        ]
+        candidates = np.concatenate(runs) if runs else np.empty(0, dtype=np.int64)
+
+        x, y = self.x[candidates], self.y[candidates]
+        inside = (x >= x_range[0]) & (x <= x_range[1]) & (y >= y_range[0]) & (y <= y_range[1])
+        return np.sort(candidates[inside])
+
+
+# Undirected graph as a CSR adjacency: the neighbors of node i are
+# indices[indptr[i]:indptr[i + 1]]. A self-loop is stored once.
+class CSRGraph:
+    def __init__(self, node_count, sources, targets):
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        loops = sources == targets
+        heads = np.concatenate([sources, targets[~loops]])
+        tails = np.concatenate([targets, sources[~loops]])
+
+        order = np.argsort(heads, kind='stable')
+        self.node_count = node_count
+        self.indices = tails[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(heads, minlength=node_count))])
+        # Row of every entry of `indices`
+        self.rows = heads[order]
+        # Degree as networkx counts it: a self-loop adds 2
+        self.degree = np.diff(self.indptr) + np.bincount(sources[loops], minlength=node_count)
+
+    def neighbors(self, node):
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    # (node, neighbor) pairs of every node of `nodes`
+    def _adjacency_of(self, nodes):
+        starts = self.indptr[nodes]
+        lengths = self.indptr[nodes + 1] - starts
+        firsts = np.cumsum(lengths) - lengths
+        slots = np.repeat(starts - firsts, lengths) + np.arange(lengths.sum())
+        return np.repeat(nodes, lengths), self.indices[slots]
+
+    # PageRank by power iteration, with the same conventions as
+    # networkx.pagerank (uniform teleport and dangling-node redistribution)
+    def pagerank(self, damping=0.85, max_iter=100, tol=1e-6):
+        n = self.node_count
+        if n == 0:
+            return np.empty(0)
+        out_degree = np.diff(self.indptr)
+        dangling = out_degree == 0
+        rank = np.full(n, 1.0 / n)
+        for _ in range(max_iter):
+            share = np.divide(rank, out_degree, out=np.zeros(n), where=~dangling)
+            incoming = np.bincount(self.rows, weights=share[self.indices], minlength=n)
+            updated = damping * (incoming + rank[dangling].sum() / n) + (1 - damping) / n
+            converged = np.abs(updated - rank).sum() < n * tol
+            rank = updated
+            if converged:
+                break
+        return rank
+
+    # Community label per node by semi-synchronous label propagation: every
+    # round, nodes are split into `batches` random batches, and the nodes of
+    # each batch take at once the label most common among their neighbors,
+    # keeping their own label if it is among the most common, else breaking
+    # ties by a seeded random rank of the labels. Updating a batch at a time
+    # keeps neighbors from swapping labels back and forth forever, as they do
+    # when all nodes update together. Only nodes with a neighbor whose label
+    # changed are looked at again; it stops when none are left. Labels are
+    # renumbered by community size, 0 being the largest.
+    def communities(self, max_iter=20, batches=4, seed=0):
+        n = self.node_count
+        rng = np.random.default_rng(seed)
+        labels = np.arange(n, dtype=np.int64)
+        rank = rng.random(n)
+        dirty = np.diff(self.indptr) > 0
+        for _ in range(max_iter):
+            if not dirty.any():
+                break
+            batch = rng.integers(batches, size=n)
+            for b in range(batches):
+                nodes = np.flatnonzero(dirty & (batch == b))
+                if not len(nodes):
+                    continue
+                dirty[nodes] = False
+                rows, neighbors = self._adjacency_of(nodes)
+                keys, counts = np.unique(rows * n + labels[neighbors], return_counts=True)
+                key_rows, key_labels = np.divmod(keys, n)
+                own = key_labels == labels[key_rows]
+                # Per row: most common first, then its own label, then by rank
+                score = counts * 4.0 + own * 2.0 + rank[key_labels]
+                starts = np.flatnonzero(np.concatenate([[True], key_rows[1:] != key_rows[:-1]]))
+                best = np.flatnonzero(score == np.repeat(np.maximum.reduceat(score, starts), np.diff(np.append(starts, len(keys)))))
+                moved = best[~own[best]]
+                if len(moved):
+                    labels[key_rows[moved]] = key_labels[moved]
+                    dirty[self._adjacency_of(key_rows[moved])[1]] = True
+
+        sizes = np.bincount(labels, minlength=n)
+        by_size = np.lexsort((np.arange(n), -sizes))
+        renumbered = np.empty(n, dtype=np.int64)
+        renumbered[by_size] = np.arange(n)
+        return renumbered[labels].astype(np.int32)
+
+
+class CollaborationIndex:
+    def __init__(self, names, popularity, sources, targets):
+        self.names = np.asarray(names, dtype=object)
+        # Name <-> id table
+        self.name_index = pd.Index(self.names)
+        self.popularity = np.asarray(popularity, dtype=np.int16)
+        self.sources = np.asarray(sources, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+
+        # Structural metrics, computed once over the CSR adjacency. Reach is
+        # the number of collaborators (degree).
+        self.graph = CSRGraph(len(self.names), self.sources, self.targets)
+        self.reach = self.graph.degree.astype(np.int32)
+        self.pagerank = self.graph.pagerank()
+        self.community = self.graph.communities()
+
+        self.range_index = GridRangeIndex(self.popularity, self.reach)
+
+    # Build from a two-column edge list of artist names. Duplicate edges (in
+    # either direction) are collapsed, as in an undirected graph.
+    @classmethod
+    def from_edges(cls, edges_df, rng=None):
+        rng = rng if rng is not None else np.random.default_rng()
+        endpoints = edges_df.iloc[:, :2].to_numpy()
+
+        # Ids follow first appearance, matching networkx insertion order
+        ids, names = pd.factorize(endpoints.ravel())
+        ids = np.sort(ids.reshape(-1, 2), axis=1).astype(np.int64)
+        keys = np.unique(ids[:, 0] * len(names) + ids[:, 1])
+        sources, targets = np.divmod(keys, len(names))
+
+        # Random popularity scores (10-100)
+        popularity = rng.integers(10, 101, len(names))
+        return cls(names, popularity, sources, targets)
+
+    @property
+    def node_count(self):
+        return len(self.names)
+
+    # Ids of artists by name (-1 for unknown names)
+    def ids_of(self, names):
+        return self.name_index.get_indexer(names)
+
+    # Node ids and edge ids surviving the slider ranges
+    def filter(self, popularity_range, reach_range):
+        node_ids = self.range_index.query(popularity_range, reach_range)
+        mask = np.zeros(self.node_count, dtype=bool)
+        mask[node_ids] = True
+        edge_ids = np.flatnonzero(mask[self.sources] & mask[self.targets])
+        return node_ids, edge_ids
+
+    # NaN-separated line coordinates (x0, x1, NaN, ...) for the given edges
+    def edge_coordinates(self, edge_ids, x, y):
+        sources, targets = self.sources[edge_ids], self.targets[edge_ids]
+        edge_x = np.full(3 * len(edge_ids), np.nan)
+        edge_y = np.full(3 * len(edge_ids), np.nan)
+        edge_x[0::3], edge_x[1::3] = x[sources], x[targets]
+        edge_y[0::3], edge_y[1::3] = y[sources], y[targets]
+        return edge_x, edge_y
@@ -0,0 +1,266 @@
+# Data access layer for the dashboard
+#
+# Datasets are read from their extracted files, or, when those are missing,
+# straight out of the zip archives shipped under Data/ (see streaming.py).
+# Every source (CSV / XLSX / archive) is parsed once and converted into a typed
+# columnar cache (Parquet) under CACHE_DIR. The cache file name carries a
+# fingerprint of the source (size + mtime) and of the dataset's schema, so it
+# is rebuilt only when either changes. Loaded frames are also kept in memory
+# per process, so callbacks only pay for an os.stat() per call.
+#
+# Each dataset has a schema (DATASET_SCHEMAS): only the columns the dashboard
+# uses are read, low-cardinality strings are stored as categoricals and
+# numbers are downcast. Every worker holds these frames, so their size bounds
+# how many workers fit on a machine; create_app() logs it per dataset, with
+# the resident memory of the process once they are loaded.
+
+import os
+import sys
+import hashlib
+import functools
+import logging
+import resource
+import threading
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import span
+from streaming import iter_chunks, read_member
+
+logger = logging.getLogger(__name__)
+
+# Source files used by the dashboard, keyed by dataset name
+DATA_SOURCES = {
+    'spotify_tracks': "Data/spotify_tracks_dataset.csv",
+    'spotify_dataset': "Data/spotify_dataset.csv",
+    'user_behavior': "Data/Spotify_User_Behavior_Dataset.xlsx",
+    'collaborations': "simulated_collaborations.csv",
+}
+
+# Columns loaded per dataset and the dtype each is stored as (None keeps the
+# parsed dtype). Integer dtypes are only applied when every value fits; other
+# columns of the source are never read.
+DATASET_SCHEMAS = {
+    'spotify_tracks': {
+        'track_id': None,
+        'track_name': None,
+        'artists': None,
+        'popularity': 'int16',
+        'track_genre': 'category',
+        'danceability': 'float32',
+        'energy': 'float32',
+        'acousticness': 'float32',
+        'speechiness': 'float32',
+        'liveness': 'float32',
+    },
+    'spotify_dataset': {
+        'name': None,
+        'genre': 'category',
+        'artists': None,
+        'popularity': 'int16',
+    },
+    'user_behavior': {
+        'Age': 'category',
+        'Gender': 'category',
+        'spotify_subscription_plan': 'category',
+        'premium_sub_willingness': 'category',
+        'fav_music_genre': 'category',
+        'music_time_slot': 'category',
+        'music_recc_rating': 'int16',
+        'pod_variety_satisfaction': 'category',
+    },
+    'collaborations': {
+        'Artist_A': 'category',
+        'Artist_B': 'category',
+    },
+}
+
+# Zip archives used when a dataset's extracted file is missing:
+# dataset name -> (archive, member). A member of None means the first CSV or
+# Excel file in the archive. The catalog archive can be switched, e.g. to
+# "Data/artificial dataset.zip", with SPOTIFY_CATALOG_ARCHIVE.
+DATA_ARCHIVES = {
+    'spotify_dataset': (os.environ.get('SPOTIFY_CATALOG_ARCHIVE', "Data/Spotify dataset.zip"), None),
+    'user_behavior': ("Data/Spotify User Behavior Dataset.zip", 'Spotify_data.xlsx'),
+}
+
+# Where the columnar copies are written
+CACHE_DIR = os.environ.get('SPOTIFY_CACHE_DIR', '.cache')
+COLUMNAR_DIR = os.path.join(CACHE_DIR, 'columnar')
+
+# In-process copies: dataset name -> (fingerprint, DataFrame)
+_frames = {}
+_lock = threading.Lock()
+
+
+# The file a dataset is read from: its extracted file, or its archive
+def source_path(name):
+    if name not in DATA_SOURCES:
+        raise KeyError(f"Unknown dataset: {name!r}")
+    path = DATA_SOURCES[name]
+    if not os.path.exists(path) and name in DATA_ARCHIVES and os.path.exists(DATA_ARCHIVES[name][0]):
+        return DATA_ARCHIVES[name][0]
+    return path
+
+
+# Fingerprint of a source file: changes whenever the file is rewritten or appended to
+def dataset_fingerprint(name):
+    stat = os.stat(source_path(name))
+    return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+
+# Combined fingerprint of several datasets, used as a cache-key component
+def dataset_fingerprints(*names):
+    return '|'.join(f"{name}:{dataset_fingerprint(name)}" for name in names)
+
+
+def _read_source(name):
+    path = source_path(name)
+    columns = DATASET_SCHEMAS.get(name)
+    usecols = (lambda column: column in columns) if columns else None
+    if path.endswith('.zip'):
+        return read_member(path, DATA_ARCHIVES[name][1], columns)
+    if path.endswith(('.xlsx', '.xls')):
+        return pd.read_excel(path, usecols=usecols)
+    return pd.read_csv(path, usecols=usecols)
+
+
+def _cast(column, dtype):
+    if dtype is None:
+        return column
+    if dtype == 'category':
+        return column.astype('category')
+    if np.issubdtype(np.dtype(dtype), np.integer):
+        info = np.iinfo(dtype)
+        if column.isna().any() or not column.between(info.min, info.max).all():
+            # Missing or out-of-range values: keep the numbers, as compact floats
+            return column.astype('float32') if column.dtype.kind == 'f' else column
+    return column.astype(dtype)
+
+
+# Apply a dataset's schema to a freshly parsed frame
+def _apply_schema(name, df):
+    schema = DATASET_SCHEMAS.get(name)
+    if schema is None:
+        return df
+    return pd.DataFrame({
+        column: _cast(df[column], dtype) for column, dtype in schema.items() if column in df.columns
+    })
+
+
+# Short digest of a dataset's schema, part of its cache file names
+def _schema_tag(name):
+    return hashlib.sha1(repr(DATASET_SCHEMAS.get(name)).encode()).hexdigest()[:8]
+
+
+# Stream a dataset in DataFrame chunks of bounded size, keeping only
+# `columns`, without ever loading it whole
+def iter_dataset_chunks(name, columns=None, dtype=None):
+    path = source_path(name)
+    member = DATA_ARCHIVES[name][1] if path.endswith('.zip') else None
+    return iter_chunks(path, member, columns, dtype)
+
+
+def _cache_file(name, fingerprint, ext):
+    return os.path.join(COLUMNAR_DIR, f"{name}-{fingerprint}-{_schema_tag(name)}.{ext}")
+
+
+def _remove_stale(name, keep):
+    prefix = f"{name}-"
+    for entry in os.listdir(COLUMNAR_DIR):
+        path = os.path.join(COLUMNAR_DIR, entry)
+        if entry.startswith(prefix) and path not in keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def _write_cache(name, fingerprint, df):
+    os.makedirs(COLUMNAR_DIR, exist_ok=True)
+    # Write to a temporary file first so concurrent readers never see a partial file
+    path = _cache_file(name, fingerprint, 'parquet')
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        df.to_parquet(tmp_path, index=False)
+    except (ImportError, ValueError, TypeError) as exc:
+        # No Parquet engine, or a column Arrow can't type: keep a pickle instead
+        logger.warning("Parquet cache unavailable for %s (%s); using pickle", name, exc)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        path = _cache_file(name, fingerprint, 'pkl')
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        df.to_pickle(tmp_path)
+    os.replace(tmp_path, path)
+    _remove_stale(name, keep={path})
+    return path
+
+
+def _read_cache(name, fingerprint):
+    parquet_path = _cache_file(name, fingerprint, 'parquet')
+    if os.path.exists(parquet_path):
+        return pd.read_parquet(parquet_path)
+    pickle_path = _cache_file(name, fingerprint, 'pkl')
+    if os.path.exists(pickle_path):
+        return pd.read_pickle(pickle_path)
+    return None
+
+
+# Load a dataset by name. The returned frame is shared between callers and must
+# not be modified in place.
+def load_dataset(name):
+    with span('load'):
+        fingerprint = dataset_fingerprint(name)
+        cached = _frames.get(name)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+
+        with _lock:
+            cached = _frames.get(name)
+            if cached is not None and cached[0] == fingerprint:
+                return cached[1]
+
+            df = _read_cache(name, fingerprint)
+            if df is None:
+                logger.info("Building columnar cache for %s", name)
+                df = _apply_schema(name, _read_source(name))
+                _write_cache(name, fingerprint, df)
+            _frames[name] = (fingerprint, df)
+            return df
+
+
+# Memory held by the in-process copies of the loaded datasets, in bytes
+def dataset_memory():
+    return {name: int(df.memory_usage(index=True, deep=True).sum()) for name, (_, df) in _frames.items()}
+
+
+# Peak resident memory of this process, in bytes (ru_maxrss is in KiB on Linux)
+def process_peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+# Memoize a zero-argument builder on the fingerprints of the datasets it reads,
+# so derived structures are rebuilt only when one of those datasets changes.
+def fingerprint_cached(*names):
+    def decorator(builder):
+        state = {}
+        lock = threading.Lock()
+
+        @functools.wraps(builder)
+        def wrapper():
+            key = dataset_fingerprints(*names)
+            entry = state.get('entry')
+            if entry is None or entry[0] != key:
+                with lock:
+                    entry = state.get('entry')
+                    if entry is None or entry[0] != key:
+                        with span('aggregate'):
+                            entry = (key, builder())
+                        state['entry'] = entry
+            return entry[1]
+
+        wrapper.datasets = names
+        return wrapper
+    return decorator
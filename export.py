@@ -0,0 +1,462 @@
+# Static snapshot of the dashboard, servable by any static file server
+#
+#   python export.py --output export --workers 4
+#
+# Every page (the landing page, /artists, /user-behavior and /genre-popularity)
+# is rendered from its Dash layout into plain HTML, inside the app's shell and
+# navigation bar, at <output>/<page>/index.html. Graph figures are written
+# next to it as JSON (figures/<graph id>.json) and drawn with plotly.js by
+# export.js. Graphs filled by a callback get that callback's output for the
+# controls' initial values.
+#
+# Callback states that can be enumerated are precomputed too: the genre
+# sunburst's data for every genre dropdown value and every slider step. Equal
+# data is written once, as content-addressed files under
+# genre-popularity/sunburst/, and sunburst/states.json maps each
+# "genre|limit" pair to its file, so the exported dropdown and slider keep
+# working without a server. Controls whose states can't be enumerated
+# (multi-select filters, range sliders, search and the track table) are left
+# out and their charts show the unfiltered view.
+#
+# Pages and states are rendered by a process pool. manifest.json records the
+# fingerprint each of them was rendered with: the datasets it reads, the
+# settings that change the output (EXPORT_SETTINGS), the plotly version and a
+# hash of the dashboard's modules and assets. On the next export, those whose
+# fingerprint hasn't changed are skipped (--force renders everything again).
+
+import os
+import re
+import json
+import html
+import shutil
+import hashlib
+import importlib
+import logging
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import plotly
+import plotly.offline
+from plotly.io.json import to_json_plotly
+
+from data_store import dataset_fingerprints
+
+logger = logging.getLogger(__name__)
+
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'export')
+
+# Processes rendering pages and states
+EXPORT_WORKERS = int(os.environ.get('EXPORT_WORKERS', os.cpu_count() or 1))
+
+# Steps of the genre-limit-slider
+GENRE_LIMITS = range(1, 101)
+
+# Bumped whenever the exported files change shape, to invalidate old exports
+_FORMAT = 1
+
+# Settings that change the exported files, as (module, name)
+EXPORT_SETTINGS = [
+    ('app', 'COLLABORATION_FILTERING'),
+    ('app', 'COLLABORATION_SEED'),
+    ('app', 'SCATTERGL_THRESHOLD'),
+    ('app', 'SUNBURST_TOP_ARTISTS'),
+    ('app', 'SUNBURST_EXPANDED_ARTISTS'),
+    ('app', 'RADAR_DEFAULT_GENRES'),
+    ('ingest', 'CATALOG_INGESTION'),
+    ('ingest', 'STREAM_TITLE_LIMIT'),
+    ('serialization', 'FIGURE_FLOAT_PRECISION'),
+    ('serialization', 'TYPED_ARRAY_MIN_LENGTH'),
+    ('wordcloud_cache', 'WORDCLOUD_BASE_SIZE'),
+    ('wordcloud_cache', 'WORDCLOUD_SIZES'),
+    ('wordcloud_cache', 'WORDCLOUD_FORMATS'),
+]
+
+# Directory of each route in the export
+PAGE_DIRS = {
+    '/': '',
+    '/artists': 'artists',
+    '/user-behavior': 'user-behavior',
+    '/genre-popularity': 'genre-popularity',
+}
+
+# Controls kept in the export: they select precomputed states
+STATE_INPUTS = ('genre-dropdown', 'genre-limit-slider')
+
+# Graph id -> file of its precomputed states, relative to the page
+GRAPH_STATES = {'sunburst-chart': 'sunburst/states.json'}
+
+# Elements without a closing tag
+_VOID_TAGS = {'br', 'hr', 'img', 'input', 'source', 'meta', 'link'}
+
+# Style properties that React leaves unitless
+_UNITLESS = {'opacity', 'flex', 'flexGrow', 'flexShrink', 'zIndex', 'fontWeight', 'lineHeight', 'order'}
+
+# html component props -> HTML attributes
+_ATTRIBUTES = {
+    'id': 'id', 'className': 'class', 'src': 'src', 'srcSet': 'srcset', 'href': 'href', 'type': 'type',
+    'width': 'width', 'height': 'height', 'alt': 'alt', 'title': 'title',
+}
+
+EXPORT_SCRIPT = """\
+// Draws the exported figures and swaps in precomputed callback states
+(function () {
+  function load(url) {
+    return fetch(url).then(function (response) { return response.json(); });
+  }
+
+  document.querySelectorAll('[data-figure]').forEach(function (div) {
+    load(div.dataset.figure).then(function (figure) {
+      Plotly.newPlot(div, figure.data, figure.layout, {responsive: true});
+      if (!div.dataset.states) {
+        return;
+      }
+      // Replace the first trace's data with the state matching the controls
+      var directory = div.dataset.states.replace(/[^/]*$/, '');
+      var inputs = div.dataset.inputs.split(' ').map(function (id) { return document.getElementById(id); });
+      var states = load(div.dataset.states);
+      function update() {
+        var key = inputs.map(function (input) { return input.value; }).join('|');
+        states.then(function (index) {
+          var file = index[key];
+          if (!file) {
+            return;
+          }
+          load(directory + file + '.json').then(function (data) {
+            figure.data[0] = Object.assign({}, figure.data[0], data, {level: ''});
+            Plotly.react(div, figure.data, figure.layout);
+          });
+        });
+      }
+      inputs.forEach(function (input) {
+        input.addEventListener('change', update);
+        input.addEventListener('input', function () {
+          var label = document.getElementById(input.id + '-value');
+          if (label) {
+            label.textContent = input.value;
+          }
+        });
+      });
+    });
+  });
+})();
+"""
+
+
+def _css(style):
+    declarations = []
+    for key, value in (style or {}).items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and key not in _UNITLESS:
+            value = f"{value}px"
+        name = re.sub(r'([A-Z])', r'-\1', key).lower()
+        declarations.append(f"{name}: {value}")
+    return '; '.join(declarations)
+
+
+def _attributes(attributes):
+    return ''.join(
+        f' {name}="{html.escape(str(value))}"' for name, value in attributes.items() if value is not None
+    )
+
+
+# Where a page's HTML, figures and states go, and how its links resolve
+class PageContext:
+    def __init__(self, output, route):
+        self.output = output
+        self.directory = os.path.join(output, PAGE_DIRS[route])
+        self.root = '../' if PAGE_DIRS[route] else ''
+
+    # Links and image sources of the live app are absolute paths; make them
+    # relative to the page, copying word cloud images into the export
+    def url(self, url):
+        if not isinstance(url, str) or not url.startswith('/'):
+            return url
+        match = re.fullmatch(r'/wordcloud/(\w+)/(\d+)\.(\w+)', url)
+        if match:
+            from wordcloud_cache import wordcloud_path
+
+            target = os.path.join(self.output, url.lstrip('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.copyfile(wordcloud_path(match[1], int(match[2]), match[3]), target)
+            return self.root + url.lstrip('/')
+        page = url.rstrip('/') or '/'
+        if page in PAGE_DIRS:
+            return self.root + (f"{PAGE_DIRS[page]}/" if PAGE_DIRS[page] else '') + 'index.html'
+        return self.root + url.lstrip('/')
+
+    def srcset(self, srcset):
+        return ', '.join(
+            ' '.join([self.url(url), *descriptor])
+            for url, *descriptor in (candidate.split() for candidate in srcset.split(','))
+        )
+
+    def write_json(self, path, value):
+        path = os.path.join(self.directory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(to_json_plotly(value))
+
+
+def _element(tag, props, context):
+    attributes = {_ATTRIBUTES[key]: value for key, value in props.items() if key in _ATTRIBUTES}
+    for key in ('src', 'href'):
+        if key in attributes:
+            attributes[key] = context.url(attributes[key])
+    if 'srcset' in attributes:
+        attributes['srcset'] = context.srcset(attributes['srcset'])
+    if props.get('style'):
+        attributes['style'] = _css(props['style'])
+    if tag in _VOID_TAGS:
+        return f"<{tag}{_attributes(attributes)}>"
+    return f"<{tag}{_attributes(attributes)}>{render_html(props.get('children'), context)}</{tag}>"
+
+
+def _graph(props, context):
+    graph_id = props['id']
+    # Graphs without a figure are filled by a callback, whose output the
+    # export writes to the same path
+    if props.get('figure') is not None:
+        context.write_json(f"figures/{graph_id}.json", props['figure'])
+    attributes = {'id': graph_id, 'data-figure': f"figures/{graph_id}.json", 'style': _css(props.get('style'))}
+    if graph_id in GRAPH_STATES:
+        attributes['data-states'] = GRAPH_STATES[graph_id]
+        attributes['data-inputs'] = ' '.join(STATE_INPUTS)
+    return f"<div{_attributes(attributes)}></div>"
+
+
+def _dropdown(props, context):
+    if props.get('id') not in STATE_INPUTS or props.get('multi'):
+        return ''
+    options = ''.join(
+        f"<option{_attributes({'value': option['value'], 'selected': 'selected' if option['value'] == props.get('value') else None})}>"
+        f"{html.escape(str(option['label']))}</option>"
+        for option in props.get('options', [])
+    )
+    return f"<select{_attributes({'id': props['id'], 'style': _css(props.get('style'))})}>{options}</select>"
+
+
+def _slider(props, context):
+    if props.get('id') not in STATE_INPUTS:
+        return ''
+    attributes = {key: props.get(key) for key in ('id', 'min', 'max', 'step', 'value')}
+    return (
+        f"<input type=\"range\"{_attributes(attributes)} style=\"width: 100%\">"
+        f"<span id=\"{html.escape(props['id'])}-value\">{html.escape(str(props.get('value')))}</span>"
+    )
+
+
+def _link(props, context):
+    return _element('a', props, context)
+
+
+# Static renderers of the dcc components that have a static counterpart;
+# other components (stores, intervals, tables...) need a server and are left out
+STATIC_COMPONENTS = {
+    ('dash_core_components', 'Graph'): _graph,
+    ('dash_core_components', 'Dropdown'): _dropdown,
+    ('dash_core_components', 'Slider'): _slider,
+    ('dash_core_components', 'Link'): _link,
+}
+
+
+# HTML for a Dash component tree decoded from JSON (see plain_json)
+def render_html(node, context):
+    if node is None or isinstance(node, bool):
+        return ''
+    if isinstance(node, (str, int, float)):
+        return html.escape(str(node))
+    if isinstance(node, list):
+        return ''.join(render_html(child, context) for child in node)
+    if node.get('namespace') == 'dash_html_components':
+        return _element(node['type'].lower(), node.get('props', {}), context)
+    renderer = STATIC_COMPONENTS.get((node.get('namespace'), node.get('type')))
+    return renderer(node.get('props', {}), context) if renderer else ''
+
+
+def _with_page(shell, page):
+    if isinstance(shell, list):
+        return [_with_page(child, page) for child in shell]
+    if not isinstance(shell, dict) or 'props' not in shell:
+        return shell
+    props = dict(shell['props'])
+    if props.get('id') == 'page-content':
+        props['children'] = page
+    elif 'children' in props:
+        props['children'] = _with_page(props['children'], page)
+    return dict(shell, props=props)
+
+
+# `value` encoded as Dash would and decoded back to plain dicts and lists
+def plain_json(value):
+    return json.loads(to_json_plotly(value))
+
+
+# Tasks, run in the pool processes. Each returns what the parent needs to
+# know about its outputs, which is also kept in the manifest.
+
+def export_page(output, route):
+    import app
+    from serialization import serialize_output
+
+    context = PageContext(output, route)
+    shell, _ = serialize_output(app.app.layout)
+    body = render_html(_with_page(plain_json(shell), plain_json(app.display_page(route))), context)
+    stylesheets = ''.join(
+        f'<link rel="stylesheet" href="{html.escape(url)}">' for url in app.app.config.external_stylesheets
+    )
+    os.makedirs(context.directory, exist_ok=True)
+    with open(os.path.join(context.directory, 'index.html'), 'w') as f:
+        f.write(
+            f"<!DOCTYPE html>\n<html><head><meta charset=\"utf-8\"><title>{html.escape(app.app.title)}</title>"
+            f"{stylesheets}<script src=\"{context.root}plotly.min.js\"></script>"
+            f"<script src=\"{context.root}export.js\" defer></script></head>"
+            f"<body style=\"margin: 0; font-family: Arial, sans-serif; background-color: #191414\">{body}</body></html>\n"
+        )
+    return None
+
+
+def export_collaboration_graph(output):
+    import app
+
+    figure = app.update_collaboration_graph(None, None, 'scores', 'popularity', 'popularity')
+    PageContext(output, '/artists').write_json('figures/collaboration-graph.json', figure)
+    return None
+
+
+# Sunburst data of one genre dropdown value at every slider step; returns
+# {"genre|limit": file}
+def export_sunburst_states(output, genre):
+    import app
+
+    context = PageContext(output, '/genre-popularity')
+    files = {}
+    for limit in GENRE_LIMITS:
+        data = app.sunburst_chart_data(genre, limit, None)
+        encoded = to_json_plotly(data)
+        name = hashlib.sha1(encoded.encode()).hexdigest()[:16]
+        path = os.path.join(context.directory, 'sunburst', f"{name}.json")
+        if not os.path.exists(path):
+            context.write_json(f"sunburst/{name}.json", data)
+        files[f"{genre}|{limit}"] = name
+    return files
+
+
+def _run(task, output):
+    func, args = task['func'], task['args']
+    return globals()[func](output, *args)
+
+
+def export_tasks():
+    import app
+
+    tasks = [
+        {'id': f"page:{route}", 'func': 'export_page', 'args': [route],
+         'datasets': app.PAGE_RENDERERS.get(route, (None, ()))[1]}
+        for route in PAGE_DIRS
+    ]
+    tasks.append({'id': 'collaboration-graph', 'func': 'export_collaboration_graph', 'args': [],
+                  'datasets': ('collaborations',)})
+    genres = ["All", *app.genre_popularity().index]
+    tasks += [
+        {'id': f"sunburst:{genre}", 'func': 'export_sunburst_states', 'args': [genre],
+         'datasets': ('spotify_dataset',)}
+        for genre in genres
+    ]
+    settings = export_settings()
+    for task in tasks:
+        key = json.dumps([settings, task['func'], task['args'], dataset_fingerprints(*task['datasets'])])
+        task['fingerprint'] = hashlib.sha1(key.encode()).hexdigest()
+    return tasks
+
+
+# Everything besides the datasets that the exported files depend on
+def export_settings():
+    code = hashlib.sha1()
+    directory = os.path.dirname(os.path.abspath(__file__))
+    paths = [name for name in os.listdir(directory) if name.endswith('.py')]
+    for root, _, files in os.walk(os.path.join(directory, 'assets')):
+        paths += [os.path.relpath(os.path.join(root, name), directory) for name in files]
+    for path in sorted(paths):
+        with open(os.path.join(directory, path), 'rb') as f:
+            code.update(path.encode() + b'\0' + f.read())
+    return {
+        'format': _FORMAT,
+        'plotly': plotly.__version__,
+        'code': code.hexdigest(),
+        **{
+            f"{module}.{name}": repr(getattr(importlib.import_module(module), name))
+            for module, name in EXPORT_SETTINGS
+        },
+    }
+
+
+def _load_manifest(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+# Export the dashboard to `output`; returns the number of tasks rendered
+def export(output=EXPORT_DIR, workers=EXPORT_WORKERS, force=False):
+    from app import create_app
+
+    # Load the data and warm the indexes once, before forking the pool
+    create_app()
+    os.makedirs(output, exist_ok=True)
+    manifest_path = os.path.join(output, 'manifest.json')
+    manifest = {} if force else _load_manifest(manifest_path)
+
+    tasks = export_tasks()
+    pending = [task for task in tasks if manifest.get(task['id'], {}).get('fingerprint') != task['fingerprint']]
+    logger.info("Exporting %d of %d pages and states to %s", len(pending), len(tasks), output)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork')) as pool:
+        results = pool.map(_run, pending, [output] * len(pending))
+        for task, result in zip(pending, results):
+            manifest[task['id']] = {'fingerprint': task['fingerprint'], 'outputs': result}
+
+    manifest = {task['id']: manifest[task['id']] for task in tasks}
+    _write_states(output, manifest)
+
+    with open(os.path.join(output, 'plotly.min.js'), 'w') as f:
+        f.write(plotly.offline.get_plotlyjs())
+    with open(os.path.join(output, 'export.js'), 'w') as f:
+        f.write(EXPORT_SCRIPT)
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return len(pending)
+
+
+# Merge the sunburst states of all genres into states.json and remove the
+# data files no state points to anymore
+def _write_states(output, manifest):
+    states = {}
+    for task_id, entry in manifest.items():
+        if task_id.startswith('sunburst:'):
+            states.update(entry['outputs'])
+    context = PageContext(output, '/genre-popularity')
+    context.write_json(GRAPH_STATES['sunburst-chart'], states)
+
+    directory = os.path.join(context.directory, 'sunburst')
+    used = {f"{name}.json" for name in states.values()} | {'states.json'}
+    for name in os.listdir(directory):
+        if name not in used:
+            os.remove(os.path.join(directory, name))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the Spotify dashboard as static HTML and JSON.")
+    parser.add_argument('--output', default=EXPORT_DIR, help="Directory to write the export to")
+    parser.add_argument('--workers', type=int, default=EXPORT_WORKERS, help="Number of rendering processes")
+    parser.add_argument('--force', action='store_true', help="Render everything, even if unchanged")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    rendered = export(args.output, args.workers, args.force)
+    print(f"Rendered {rendered} pages and states into {args.output}")
+
+
+if __name__ == '__main__':
+    main()
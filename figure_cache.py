@@ -0,0 +1,122 @@
+# Bounded in-memory cache for callback outputs
+#
+# Callback inputs come from a small, finite space (dropdown values and sliders
+# with fixed steps), so outputs are memoized on (callback, normalized inputs,
+# dataset fingerprint). Entries are stored compacted (see serialization.py),
+# so a hit is handed to Dash as is and encoded once, and are evicted
+# least-recently-used once the byte budget is exceeded.
+
+import os
+import functools
+import threading
+from collections import OrderedDict
+
+from data_store import dataset_fingerprints
+from serialization import serialize_output
+
+# Byte budgets for cached outputs, measured on their approximate JSON size
+FIGURE_CACHE_BYTES = int(os.environ.get('FIGURE_CACHE_BYTES', 64 * 1024 * 1024))
+LAYOUT_CACHE_BYTES = int(os.environ.get('LAYOUT_CACHE_BYTES', 32 * 1024 * 1024))
+
+_MISSING = object()
+
+
+class FigureCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (value, size in bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, size):
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[1]
+            # Never let a single oversized entry flush the whole cache
+            if size > self.max_bytes:
+                return
+            while self._entries and self._bytes + size > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+            self._entries[key] = (value, size)
+            self._bytes += size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+figure_cache = FigureCache(FIGURE_CACHE_BYTES)
+layout_cache = FigureCache(LAYOUT_CACHE_BYTES)
+
+
+# Snap a slider value onto its step grid and clamp it to the slider bounds
+def quantize_value(value, low, high, step):
+    if value is None:
+        return low
+    snapped = low + round((value - low) / step) * step
+    return min(max(snapped, low), high)
+
+
+# Normalize a RangeSlider value to a sorted pair on the slider's step grid
+def quantize_range(value, low, high, step):
+    if not value:
+        return (low, high)
+    start, end = sorted(quantize_value(v, low, high, step) for v in value)
+    return (start, end)
+
+
+# Look up `key` in `cache`, building and compacting the value on a miss
+def _cached_output(cache, key, build):
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value, size = serialize_output(build())
+        cache.put(key, value, size)
+    return value
+
+
+# Memoize a callback on its normalized inputs and the fingerprints of the
+# datasets it reads. `normalize` maps the raw callback arguments to a hashable
+# tuple of arguments; it defaults to the arguments as given.
+def cached_callback(*datasets, normalize=None, cache=figure_cache):
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args):
+            inputs = normalize(*args) if normalize else args
+            key = (func.__name__, inputs, dataset_fingerprints(*datasets))
+            return _cached_output(cache, key, lambda: func(*inputs))
+        return wrapper
+    return decorator
+
+
+# Compacted page layout for `route`, rebuilt by `render` only when one of the
+# datasets the page reads has changed
+def cached_layout(route, render, datasets, cache=layout_cache):
+    key = (route, dataset_fingerprints(*datasets))
+    return _cached_output(cache, key, render)
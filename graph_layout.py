@@ -0,0 +1,199 @@
+# Force-directed layout of the collaboration graph, computed off the request path
+#
+# Layouts are computed in a background process pool and cached on disk under
+# CACHE_DIR/graph_layout, keyed by the fingerprint of the edge list (plus the
+# layout parameters), so every gunicorn worker and every restart reuses them.
+# Requests only ever read a finished layout: while one is being computed,
+# LayoutService.get() returns None and callers fall back to another view. A
+# lock file next to the cache file makes sure only one process computes a
+# given layout.
+#
+# The layout is Fruchterman-Reingold with the repulsive forces approximated on
+# a grid (particle-mesh): node counts are binned onto a LAYOUT_GRID x
+# LAYOUT_GRID grid and convolved with the repulsion kernel by FFT. An
+# iteration then costs O(nodes + edges + grid^2 log grid) instead of
+# O(nodes^2), which keeps graphs of hundreds of thousands of nodes tractable.
+
+import os
+import hashlib
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from data_store import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+LAYOUT_DIR = os.path.join(CACHE_DIR, 'graph_layout')
+
+LAYOUT_ITERATIONS = int(os.environ.get('LAYOUT_ITERATIONS', 100))
+LAYOUT_GRID = int(os.environ.get('LAYOUT_GRID', 256))
+LAYOUT_SEED = int(os.environ.get('LAYOUT_SEED', 0))
+
+# Background processes computing layouts
+LAYOUT_WORKERS = int(os.environ.get('LAYOUT_WORKERS', 1))
+
+
+def _repulsion_spectra(grid, shape):
+    # Kernel over cell offsets -(grid - 1)..(grid - 1), in cell units: the
+    # repulsion direction divided by the distance (Fruchterman-Reingold k^2 / d)
+    offsets = np.arange(-grid + 1, grid, dtype=np.float64)
+    dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+    d2 = dx ** 2 + dy ** 2
+    d2[grid - 1, grid - 1] = np.inf
+    return np.fft.rfft2(dx / d2, shape), np.fft.rfft2(dy / d2, shape)
+
+
+# Fruchterman-Reingold positions, an (n, 2) float32 array scaled into [0, 1].
+# `grid` is the finest repulsion grid used; smaller graphs get a coarser one.
+def force_layout(sources, targets, node_count, iterations=LAYOUT_ITERATIONS, grid=LAYOUT_GRID, seed=LAYOUT_SEED):
+    rng = np.random.default_rng(seed)
+    positions = rng.random((node_count, 2))
+    if node_count < 2:
+        return positions.astype(np.float32)
+
+    k = np.sqrt(1.0 / node_count)
+    # Small graphs don't need a fine grid
+    grid = int(min(grid, max(16, 4 * np.sqrt(node_count))))
+    # Linear (not circular) convolution needs padding to 3 * grid - 2
+    shape = (3 * grid - 2, 3 * grid - 2)
+    kernel_x, kernel_y = _repulsion_spectra(grid, shape)
+    window = slice(grid - 1, 2 * grid - 1)
+
+    temperature = 0.1
+    cooling = temperature / (iterations + 1)
+    for _ in range(iterations):
+        # Repulsion: bin nodes onto the grid and convolve with the kernel
+        low = positions.min(axis=0)
+        cell_size = max((positions.max(axis=0) - low).max(), 1e-9) / grid
+        cells = np.minimum(((positions - low) / cell_size).astype(np.int64), grid - 1)
+        flat = cells[:, 0] * grid + cells[:, 1]
+        density = np.fft.rfft2(np.bincount(flat, minlength=grid * grid).reshape(grid, grid), shape)
+        field_x = np.fft.irfft2(density * kernel_x, shape)[window, window].ravel()
+        field_y = np.fft.irfft2(density * kernel_y, shape)[window, window].ravel()
+        displacement = np.column_stack([field_x[flat], field_y[flat]]) * (k * k / cell_size)
+
+        # Attraction along edges: d^2 / k
+        delta = positions[sources] - positions[targets]
+        pull = delta * (np.hypot(delta[:, 0], delta[:, 1]) / k)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] -= np.bincount(sources, pull[:, axis], minlength=node_count)
+            displacement[:, axis] += np.bincount(targets, pull[:, axis], minlength=node_count)
+
+        # Move every node by at most the current temperature
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 1e-12)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature -= cooling
+
+    positions -= positions.min(axis=0)
+    positions /= max(positions.max(), 1e-12)
+    return positions.astype(np.float32)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Take the lock file for `path`, unless a live process holds it
+def _acquire(lock_path):
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                with open(lock_path) as f:
+                    holder = int(f.read() or 0)
+            except (OSError, ValueError):
+                holder = 0
+            if holder and _pid_alive(holder):
+                return False
+            # Left behind by a process that died mid-computation
+            try:
+                os.remove(lock_path)
+            except FileNotFoundError:
+                pass
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(str(os.getpid()))
+        return True
+    return False
+
+
+# Runs in a pool process: compute the layout and write it to `path`
+def _compute_and_store(path, sources, targets, node_count):
+    lock_path = f"{path}.lock"
+    if os.path.exists(path) or not _acquire(lock_path):
+        return path
+    try:
+        positions = force_layout(sources, targets, node_count)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_path, positions)
+        os.replace(tmp_path, path)
+    finally:
+        os.remove(lock_path)
+    return path
+
+
+class LayoutService:
+    def __init__(self, directory=LAYOUT_DIR, workers=LAYOUT_WORKERS):
+        self.directory = directory
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._pid = None
+        self._pool = None
+        self._pending = {}  # key -> Future
+        self._layouts = {}  # key -> positions
+
+    # Cache key of the layout of a graph: its edge list and the layout parameters
+    @staticmethod
+    def key(sources, targets, node_count):
+        digest = hashlib.sha1(f"{node_count}:{LAYOUT_ITERATIONS}:{LAYOUT_GRID}:{LAYOUT_SEED}".encode())
+        digest.update(np.ascontiguousarray(sources, dtype=np.int64).tobytes())
+        digest.update(np.ascontiguousarray(targets, dtype=np.int64).tobytes())
+        return digest.hexdigest()[:16]
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.npy")
+
+    # The finished layout for `key`, or None if it isn't computed yet
+    def get(self, key):
+        positions = self._layouts.get(key)
+        if positions is None and os.path.exists(self.path(key)):
+            positions = self._layouts[key] = np.load(self.path(key))
+        return positions
+
+    # Start computing the layout of a graph in the background, unless it is
+    # cached or already being computed; returns its key
+    def ensure(self, sources, targets, node_count):
+        key = self.key(sources, targets, node_count)
+        if self.get(key) is not None:
+            return key
+        with self._lock:
+            if self._pid != os.getpid():
+                # In a forked worker, the parent's pool is unusable
+                self._pid, self._pool, self._pending = os.getpid(), None, {}
+            future = self._pending.get(key)
+            if future is not None and not future.done():
+                return key
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('fork')
+                )
+            os.makedirs(self.directory, exist_ok=True)
+            logger.info("Computing the layout of a %d-node graph in the background", node_count)
+            self._pending[key] = self._pool.submit(
+                _compute_and_store, self.path(key), sources, targets, node_count
+            )
+        return key
+
+
+layout_service = LayoutService()
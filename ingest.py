@@ -0,0 +1,263 @@
+# Incremental ingestion of the song catalog
+#
+# The catalog CSV (Data/spotify_dataset.csv) grows by rows appended at the
+# end. With CATALOG_INGESTION=append, CatalogIngestor remembers the byte
+# offset up to which the file has been read. A refresh parses only the bytes
+# after it and folds the new rows into running aggregates: popularity sum and
+# row count per genre and per (genre, artist), and the title -> popularity
+# map. Refresh cost is proportional to the number of appended rows.
+#
+# A partial last record (still being written) is left for the next refresh.
+# Records end at newlines outside quoted fields, so a quoted field holding a
+# newline is never split between two parses. If the file was rewritten rather
+# than appended to (it shrank, or the bytes before the offset changed), the
+# aggregates are rebuilt from the start.
+#
+# With CATALOG_INGESTION=stream (the default when the catalog is only
+# available as a zip archive), the same running aggregates are computed from
+# bounded-size chunks streamed out of the source whenever it changes, so the
+# catalog is never held in memory as a whole. Memory then grows with the
+# number of genres, artists and kept titles, not with the number of rows.
+
+import io
+import os
+import csv
+import heapq
+import logging
+import threading
+
+import pandas as pd
+
+from data_store import source_path
+
+logger = logging.getLogger(__name__)
+
+# 'full': aggregates are recomputed from the whole catalog frame whenever it changes
+# 'append': appended rows are folded into running aggregates
+# 'stream': aggregates are recomputed from chunks streamed out of the source
+_catalog_is_archive = source_path('spotify_dataset').endswith('.zip')
+CATALOG_INGESTION = os.environ.get('CATALOG_INGESTION', 'stream' if _catalog_is_archive else 'full')
+if CATALOG_INGESTION == 'append' and _catalog_is_archive:
+    logger.warning("Zipped catalogs can't be ingested incrementally; streaming it instead")
+    CATALOG_INGESTION = 'stream'
+
+# Datasets that are never loaded as a whole frame in the current mode
+INCREMENTAL_DATASETS = ('spotify_dataset',) if CATALOG_INGESTION in ('append', 'stream') else ()
+
+# Titles kept for the word cloud in stream mode (it draws at most 200 words)
+STREAM_TITLE_LIMIT = int(os.environ.get('STREAM_TITLE_LIMIT', 5000))
+
+# Bytes parsed per pandas call, bounding memory when a large file is first read
+INGEST_BLOCK_BYTES = int(os.environ.get('INGEST_BLOCK_BYTES', 64 * 2 ** 20))
+
+# Bytes before the offset compared on refresh to tell appends from rewrites
+_TAIL_BYTES = 4096
+
+CATALOG_COLUMNS = ['name', 'genre', 'artists', 'popularity']
+CATALOG_DTYPES = {'name': str, 'genre': str, 'artists': str}
+
+# Track id, also read in append mode when the catalog has it, for the
+# consumers joining catalog rows to the tracks (see CatalogIngestor.subscribe)
+CATALOG_ID_COLUMN = 'id'
+
+
+# Length of the complete CSV records at the start of `data`, which starts at
+# a record boundary: up to the last newline outside quoted fields. Escaped
+# quotes ("") count twice, so they don't change the quoting state.
+def complete_records(data):
+    quotes = data.count(b'"')
+    end = len(data)
+    newline = data.rfind(b'\n')
+    while newline >= 0:
+        quotes -= data.count(b'"', newline, end)
+        end = newline
+        if quotes % 2 == 0:
+            return newline + 1
+        newline = data.rfind(b'\n', 0, newline)
+    return 0
+
+
+# Running popularity totals of catalog rows, folded in chunk by chunk.
+#
+# Titles map to the popularity of their last row. With `title_limit` set,
+# titles instead keep their highest popularity, and only the `title_limit`
+# most popular titles are kept. This is exact: a dropped title was below a
+# threshold that only rises, so if it comes back with a higher popularity,
+# that new value is its maximum.
+class CatalogTotals:
+    def __init__(self, title_limit=None):
+        self.title_limit = title_limit
+        self.rows = 0
+        self.genre_totals = {}   # genre -> [popularity sum, row count]
+        self.artist_totals = {}  # (genre, artist) -> [popularity sum, row count]
+        self.titles = {}         # title -> popularity
+
+    def fold(self, frame):
+        self.rows += len(frame)
+        rated = frame.dropna(subset=['genre', 'popularity'])
+
+        sums = rated.groupby('genre', sort=False)['popularity'].agg(['sum', 'count'])
+        for genre, total, count in zip(sums.index, sums['sum'].tolist(), sums['count'].tolist()):
+            entry = self.genre_totals.setdefault(genre, [0, 0])
+            entry[0] += total
+            entry[1] += count
+
+        sums = rated.dropna(subset=['artists']).groupby(['genre', 'artists'], sort=False)['popularity'].agg(['sum', 'count'])
+        for pair, total, count in zip(sums.index, sums['sum'].tolist(), sums['count'].tolist()):
+            entry = self.artist_totals.setdefault(pair, [0, 0])
+            entry[0] += total
+            entry[1] += count
+
+        named = frame.dropna(subset=['name', 'popularity'])
+        if self.title_limit is None:
+            self.titles.update(zip(named['name'], named['popularity']))
+            return
+        best = named.groupby('name', sort=False)['popularity'].max()
+        for title, popularity in zip(best.index, best.tolist()):
+            if popularity > self.titles.get(title, popularity - 1):
+                self.titles[title] = popularity
+        if len(self.titles) > 2 * self.title_limit:
+            self._prune_titles()
+
+    def _prune_titles(self):
+        kept = heapq.nlargest(self.title_limit, self.titles.items(), key=lambda item: item[1])
+        self.titles = dict(kept)
+
+    def genre_frame(self):
+        return pd.DataFrame(
+            list(self.genre_totals.values()), columns=['sum', 'count'],
+            index=pd.Index(list(self.genre_totals), name='genre'),
+        )
+
+    def artist_frame(self):
+        pairs = list(self.artist_totals)
+        return pd.DataFrame({
+            'genre': [genre for genre, _ in pairs],
+            'artists': [artist for _, artist in pairs],
+            'popularity': [total for total, _ in self.artist_totals.values()],
+        })
+
+    def title_map(self):
+        if self.title_limit is not None and len(self.titles) > self.title_limit:
+            self._prune_titles()
+        return dict(self.titles)
+
+
+class CatalogIngestor:
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._consumers = {}  # name -> consumer of the folded frames
+        # Counts rewrites, so (generation, offset) identifies the ingested rows
+        self.generation = 0
+        self._reset()
+
+    def _reset(self):
+        self.columns = None
+        self.data_start = 0
+        self.offset = 0
+        self.tail = b''
+        self.stat = None
+        self.totals = CatalogTotals()
+        self.generation += 1
+        for consumer in self._consumers.values():
+            consumer.reset()
+
+    # Fold any rows appended since the last refresh; returns whether the
+    # aggregates changed
+    def refresh(self):
+        with self._lock:
+            stat = os.stat(self.path)
+            key = (stat.st_size, stat.st_mtime_ns)
+            if key == self.stat:
+                return False
+
+            with open(self.path, 'rb') as f:
+                if not self._is_append(f, stat.st_size):
+                    logger.info("%s was rewritten; rebuilding its aggregates", self.path)
+                    self._reset()
+                rows = self.totals.rows
+                self._read_until(f, stat.st_size)
+            if self.totals.rows > rows:
+                logger.info("Ingested %d new rows from %s", self.totals.rows - rows, self.path)
+            self.stat = key
+            return True
+
+    def _is_append(self, f, size):
+        if self.offset == 0:
+            return True
+        if size < self.offset:
+            return False
+        f.seek(self.offset - len(self.tail))
+        return f.read(len(self.tail)) == self.tail
+
+    def _read_until(self, f, end):
+        for data in self._records(f, self.offset, end):
+            self._fold_lines(data)
+            self.offset += len(data)
+            self.tail = (self.tail + data)[-_TAIL_BYTES:]
+
+    # Blocks of whole records between the byte offsets `start` (a record
+    # boundary) and `end`; a partial last record is left out
+    @staticmethod
+    def _records(f, start, end):
+        f.seek(start)
+        remaining = end - start
+        pending = b''
+        while remaining > 0:
+            chunk = f.read(min(INGEST_BLOCK_BYTES, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            data = pending + chunk
+            # Only whole records are parsed; the rest waits for the next block
+            cut = complete_records(data)
+            data, pending = data[:cut], data[cut:]
+            if data:
+                yield data
+
+    def _fold_lines(self, data):
+        if self.columns is None:
+            header, _, data = data.partition(b'\n')
+            self.columns = next(csv.reader([header.decode('utf-8-sig').rstrip('\r')]))
+            self.data_start = len(header) + 1
+            if not data:
+                return
+        frame = self._parse(data)
+        self.totals.fold(frame)
+        for consumer in self._consumers.values():
+            consumer.fold(frame)
+
+    def _parse(self, data):
+        columns = CATALOG_COLUMNS + ([CATALOG_ID_COLUMN] if CATALOG_ID_COLUMN in self.columns else [])
+        return pd.read_csv(
+            io.BytesIO(data), header=None, names=self.columns, usecols=columns,
+            dtype=dict(CATALOG_DTYPES, **{CATALOG_ID_COLUMN: str}),
+        )
+
+    # Feed catalog frames to `consumer.fold(frame)`: the rows ingested so far
+    # right away, then appended rows as they are folded. `consumer.reset()` is
+    # called when the file is rewritten. A consumer replaces the one
+    # subscribed before under the same name.
+    def subscribe(self, name, consumer):
+        with self._lock:
+            self._consumers[name] = consumer
+            if self.columns is None:
+                return
+            with open(self.path, 'rb') as f:
+                for data in self._records(f, self.data_start, self.offset):
+                    consumer.fold(self._parse(data))
+
+    # Snapshots of the running aggregates, safe to use while ingestion continues
+
+    def genre_frame(self):
+        with self._lock:
+            return self.totals.genre_frame()
+
+    def artist_frame(self):
+        with self._lock:
+            return self.totals.artist_frame()
+
+    def title_map(self):
+        with self._lock:
+            return self.totals.title_map()
@@ -0,0 +1,245 @@
+# Per-callback tracing and Prometheus metrics
+#
+# With DASH_METRICS=1, every traced callback/page renderer records its total
+# latency and the time spent in each stage (load / aggregate / build_figure /
+# serialize) into latency histograms. Stages are measured with `span(stage)`
+# around the relevant code and are exclusive: time spent in a nested stage is
+# only counted once, for the innermost one. With SLOW_CALLBACK_MS set, calls
+# slower than that are logged with their stage breakdown.
+#
+# When metrics are disabled, `traced` returns the function unchanged and
+# `span` returns a shared no-op context manager.
+#
+# install_metrics() adds a /metrics route in Prometheus text format, with the
+# histograms plus cache, payload and dataset memory statistics.
+
+import os
+import time
+import bisect
+import functools
+import logging
+import threading
+from contextlib import nullcontext
+
+from flask import Response, request
+
+logger = logging.getLogger(__name__)
+
+METRICS_ENABLED = os.environ.get('DASH_METRICS', '0') == '1'
+
+# Log calls slower than this many milliseconds (0 disables)
+SLOW_CALLBACK_MS = float(os.environ.get('SLOW_CALLBACK_MS', 0))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_NOOP_SPAN = nullcontext()
+_local = threading.local()
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+
+    def observe(self, labels, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {labels: list(values) for labels, values in self._series.items()}
+        for labels, values in sorted(series.items()):
+            label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{label_text},le="+Inf"}} {values[-1]}')
+            lines.append(f'{self.name}_sum{{{label_text}}} {values[-2]}')
+            lines.append(f'{self.name}_count{{{label_text}}} {values[-1]}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+callback_latency = Histogram(
+    'dashboard_callback_seconds', "Latency of Dash callbacks and page renderers.", ('callback',)
+)
+stage_latency = Histogram(
+    'dashboard_stage_seconds', "Time spent per stage inside a callback.", ('callback', 'stage')
+)
+request_latency = Histogram(
+    'dashboard_request_seconds', "Latency of Dash callback HTTP requests, including serialization.",
+    ('callback',)
+)
+
+
+class _Span:
+    __slots__ = ('stage', 'start', 'children')
+
+    def __init__(self, stage):
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.children = 0.0
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.start
+        _local.stack.pop()
+        own = elapsed - self.children
+        parent = _local.stack[-1] if _local.stack else None
+        if parent is not None:
+            parent.children += elapsed
+        _local.stages[self.stage] = _local.stages.get(self.stage, 0.0) + own
+        return False
+
+
+# Time a stage of the current traced call. A no-op outside traced calls or
+# when metrics are disabled.
+def span(stage):
+    if not METRICS_ENABLED or getattr(_local, 'callback', None) is None:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+# Run the whole function as one stage of the current traced call
+def staged(stage):
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# Record latency and stage timings for every call of `func` under `name`
+def traced(name):
+    def decorator(func):
+        if not METRICS_ENABLED:
+            return func
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'callback', None) is not None:
+                # Inside another traced call (e.g. a renderer called by display_page):
+                # record its latency, but leave the stages to the outer call
+                start = time.perf_counter()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    callback_latency.observe((name,), time.perf_counter() - start)
+
+            _local.callback, _local.stack, _local.stages = name, [], {}
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                stages = _local.stages
+                _local.callback = None
+
+                callback_latency.observe((name,), elapsed)
+                for stage, seconds in stages.items():
+                    stage_latency.observe((name, stage), seconds)
+                if SLOW_CALLBACK_MS and elapsed * 1000 >= SLOW_CALLBACK_MS:
+                    breakdown = ', '.join(f"{stage}={seconds * 1000:.1f}ms" for stage, seconds in stages.items())
+                    logger.warning("Slow callback %s: %.1fms (%s)", name, elapsed * 1000, breakdown)
+        return wrapper
+    return decorator
+
+
+def _render_cache_stats(caches):
+    lines = []
+    for metric, key, kind, documentation in (
+        ('dashboard_cache_hits_total', 'hits', 'counter', "Cache hits."),
+        ('dashboard_cache_misses_total', 'misses', 'counter', "Cache misses."),
+        ('dashboard_cache_evictions_total', 'evictions', 'counter', "Cache evictions."),
+        ('dashboard_cache_entries', 'entries', 'gauge', "Entries held in the cache."),
+        ('dashboard_cache_bytes', 'bytes', 'gauge', "Serialized bytes held in the cache."),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} {kind}"]
+        for name, cache in caches.items():
+            lines.append(f'{metric}{{cache="{_escape(name)}"}} {cache.stats()[key]}')
+
+    lines += ["# HELP dashboard_cache_hit_ratio Fraction of lookups served from the cache.",
+              "# TYPE dashboard_cache_hit_ratio gauge"]
+    for name, cache in caches.items():
+        stats = cache.stats()
+        lookups = stats['hits'] + stats['misses']
+        ratio = stats['hits'] / lookups if lookups else 0.0
+        lines.append(f'dashboard_cache_hit_ratio{{cache="{_escape(name)}"}} {ratio}')
+    return lines
+
+
+def _render_payload_stats(payloads):
+    snapshot = payloads.snapshot()
+    lines = []
+    for metric, key, documentation in (
+        ('dashboard_payload_requests_total', 'requests', "Callback responses measured."),
+        ('dashboard_payload_raw_bytes_total', 'raw_bytes', "Callback response bytes before compression."),
+        ('dashboard_payload_sent_bytes_total', 'sent_bytes', "Callback response bytes after compression."),
+    ):
+        lines += [f"# HELP {metric} {documentation}", f"# TYPE {metric} counter"]
+        for callback, stats in sorted(snapshot.items()):
+            lines.append(f'{metric}{{callback="{_escape(callback)}"}} {stats[key]}')
+    return lines
+
+
+def _render_dataset_memory(datasets):
+    lines = ["# HELP dashboard_dataset_bytes Memory held by a loaded dataset.",
+             "# TYPE dashboard_dataset_bytes gauge"]
+    for name, size in sorted(datasets().items()):
+        lines.append(f'dashboard_dataset_bytes{{dataset="{_escape(name)}"}} {size}')
+    return lines
+
+
+# Add the /metrics route to `server`. `caches` maps a cache name to an object
+# with a stats() method (see figure_cache.FigureCache); `payloads` is a
+# serialization.PayloadStats; `datasets`, if given, returns the bytes held per
+# loaded dataset (see data_store.dataset_memory).
+def install_metrics(server, caches, payloads, datasets=None):
+    if METRICS_ENABLED:
+        # Whole-request latency per callback, including Dash's own serialization
+        @server.before_request
+        def start_request_timer():
+            if request.path.endswith('_dash-update-component'):
+                request.environ['dashboard.start'] = time.perf_counter()
+
+        @server.teardown_request
+        def record_request_latency(exc):
+            start = request.environ.get('dashboard.start')
+            if start is not None:
+                body = request.get_json(silent=True) or {}
+                request_latency.observe((body.get('output', ''),), time.perf_counter() - start)
+
+    @server.route('/metrics')
+    def serve_metrics():
+        lines = []
+        for histogram in (callback_latency, stage_latency, request_latency):
+            lines += histogram.render()
+        lines += _render_cache_stats(caches)
+        lines += _render_payload_stats(payloads)
+        if datasets is not None:
+            lines += _render_dataset_memory(datasets)
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
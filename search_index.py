@@ -0,0 +1,222 @@
+# Typeahead search over song titles and artist names
+#
+# Entries (titles and artists, each with the popularity of its most popular
+# track) are numbered by descending popularity, so "the k most popular
+# matches" is "the k smallest entry ids". Texts are case- and accent-folded
+# and split into word tokens; a query matches an entry when each of its
+# tokens is a prefix of one of the entry's tokens.
+#
+# The index is a sorted list of (token, entry) pairs: the pairs of the tokens
+# starting with a prefix are a contiguous range of it, found by binary
+# search. The top SEARCH_PREFIX_TOP entries of every prefix whose range holds
+# more than SEARCH_SCAN_LIMIT pairs, of any length, are precomputed; other
+# prefixes are answered from their range. A word of a query thus costs a
+# binary search plus at most SEARCH_SCAN_LIMIT pairs, whatever the number of
+# entries or of matches.
+#
+# Multi-word queries take their candidates from the most selective word and
+# keep those having a token in the range of each other word, through a CSR
+# list of every entry's token positions. When even the most selective word
+# is common (its range holds more than SEARCH_SCAN_LIMIT pairs), only its
+# precomputed top entries are candidates, so a rare combination of common
+# words may miss matches.
+#
+# Built indexes are written to CACHE_DIR/search, keyed by the fingerprints of
+# the datasets they were built from, so restarts and gunicorn workers load
+# them instead of rebuilding them.
+
+import os
+import re
+import bisect
+import hashlib
+import logging
+import unicodedata
+
+import numpy as np
+import pandas as pd
+
+from data_store import CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+SEARCH_DIR = os.path.join(CACHE_DIR, 'search')
+
+SEARCH_PREFIX_TOP = int(os.environ.get('SEARCH_PREFIX_TOP', 50))
+SEARCH_SCAN_LIMIT = int(os.environ.get('SEARCH_SCAN_LIMIT', 20000))
+
+# Entry kinds, by their code in `SearchIndex.kinds`
+SEARCH_KINDS = ('title', 'artist')
+
+# Bumped whenever the on-disk layout changes
+_FORMAT = 2
+
+_TOKEN = re.compile(r'\w+')
+_SEPARATOR = '\x00'
+_LAST_CHAR = '\U0010ffff'
+
+
+def fold(text):
+    text = unicodedata.normalize('NFKD', str(text).casefold())
+    return ''.join(c for c in text if not unicodedata.combining(c))
+
+
+def tokenize(text):
+    return _TOKEN.findall(fold(text))
+
+
+def _join(strings):
+    return np.frombuffer(_SEPARATOR.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _split(blob):
+    text = blob.tobytes().decode('utf-8')
+    return text.split(_SEPARATOR) if text else []
+
+
+class SearchIndex:
+    def __init__(self, texts, kinds, popularity, tokens, token_entries, prefixes, prefix_offsets, prefix_entries):
+        self.texts = texts                    # entry -> text, by descending popularity
+        self.kinds = kinds                    # entry -> index into SEARCH_KINDS
+        self.popularity = popularity          # entry -> popularity
+        self.tokens = tokens                  # sorted tokens of all entries
+        self.token_entries = token_entries    # entry of each token
+        self.prefix_offsets = prefix_offsets  # CSR: common prefix -> its top entries
+        self.prefix_entries = prefix_entries
+        self.prefix_ids = {prefix: i for i, prefix in enumerate(prefixes)}
+
+        # CSR: entry -> positions of its tokens in `tokens`
+        order = np.argsort(token_entries, kind='stable')
+        self.entry_positions = order.astype(np.int32)
+        self.entry_offsets = np.concatenate(
+            [[0], np.cumsum(np.bincount(token_entries, minlength=len(texts)))]
+        ).astype(np.int64)
+
+    # Index entries given as parallel sequences of text, kind code and popularity
+    @classmethod
+    def build(cls, texts, kinds, popularity):
+        entries = pd.DataFrame({'text': texts, 'kind': kinds, 'popularity': popularity})
+        entries = entries.dropna(subset=['text'])
+        entries = entries[entries['text'].astype(str).str.len() > 0]
+        entries = entries.sort_values(['popularity', 'text'], ascending=[False, True], kind='stable')
+        entries = entries.drop_duplicates(['text', 'kind']).reset_index(drop=True)
+
+        pairs = entries['text'].map(tokenize).explode().dropna()
+        pairs = pd.DataFrame({'token': pairs.to_numpy(dtype=object), 'entry': pairs.index.to_numpy(dtype=np.int32)})
+        pairs = pairs.drop_duplicates().sort_values(['token', 'entry'], kind='stable')
+
+        # Top entries (smallest ids) of every prefix with more than
+        # SEARCH_SCAN_LIMIT pairs. A prefix has no more pairs than its own
+        # prefixes, so each length only looks at the pairs of common prefixes
+        # one character shorter, and stops when there are none.
+        tops = []
+        common = pairs
+        length = 1
+        while len(common) > SEARCH_SCAN_LIMIT:
+            common = common[common['token'].str.len() >= length]
+            prefix = common['token'].str[:length]
+            counts = prefix.map(prefix.value_counts())
+            common = common[counts.to_numpy() > SEARCH_SCAN_LIMIT]
+            prefixed = pd.DataFrame({'prefix': common['token'].str[:length], 'entry': common['entry']})
+            prefixed = prefixed.drop_duplicates().sort_values(['prefix', 'entry'], kind='stable')
+            tops.append(prefixed.groupby('prefix', sort=False).head(SEARCH_PREFIX_TOP))
+            length += 1
+        tops = pd.concat(tops, ignore_index=True) if tops else pd.DataFrame({'prefix': [], 'entry': []})
+        prefixes, codes = np.unique(tops['prefix'].to_numpy(dtype=object), return_inverse=True)
+        order = np.argsort(codes, kind='stable')
+
+        return cls(
+            entries['text'].astype(str).tolist(),
+            entries['kind'].to_numpy(dtype=np.uint8),
+            entries['popularity'].to_numpy(dtype=np.int16),
+            pairs['token'].tolist(),
+            pairs['entry'].to_numpy(dtype=np.int32),
+            prefixes.tolist(),
+            np.concatenate([[0], np.cumsum(np.bincount(codes, minlength=len(prefixes)))]).astype(np.int64),
+            tops['entry'].to_numpy(dtype=np.int32)[order],
+        )
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        prefixes = sorted(self.prefix_ids, key=self.prefix_ids.get)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(
+            tmp_path, texts=_join(self.texts), kinds=self.kinds, popularity=self.popularity,
+            tokens=_join(self.tokens), token_entries=self.token_entries,
+            prefixes=_join(prefixes), prefix_offsets=self.prefix_offsets, prefix_entries=self.prefix_entries,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls(
+                _split(arrays['texts']), arrays['kinds'], arrays['popularity'],
+                _split(arrays['tokens']), arrays['token_entries'],
+                _split(arrays['prefixes']), arrays['prefix_offsets'], arrays['prefix_entries'],
+            )
+
+    def __len__(self):
+        return len(self.texts)
+
+    # Range of `tokens` starting with `prefix`
+    def _range(self, prefix):
+        return (bisect.bisect_left(self.tokens, prefix), bisect.bisect_right(self.tokens, prefix + _LAST_CHAR))
+
+    # Entries having a token starting with `prefix`, by descending popularity:
+    # the precomputed top entries of a common prefix, else its whole range
+    def _candidates(self, prefix, lo, hi):
+        i = self.prefix_ids.get(prefix)
+        if i is not None:
+            return self.prefix_entries[self.prefix_offsets[i]:self.prefix_offsets[i + 1]]
+        return np.unique(self.token_entries[lo:hi])
+
+    # Which of `entries` have a token in tokens[lo:hi]
+    def _has_token_in(self, entries, lo, hi):
+        starts = self.entry_offsets[entries]
+        lengths = self.entry_offsets[entries + 1] - starts
+        firsts = np.cumsum(lengths) - lengths
+        slots = np.repeat(starts - firsts, lengths) + np.arange(lengths.sum())
+        positions = self.entry_positions[slots]
+        inside = ((positions >= lo) & (positions < hi)).astype(np.int32)
+        return np.add.reduceat(inside, firsts) > 0 if len(entries) else np.zeros(0, dtype=bool)
+
+    # The `limit` most popular entries matching `query`, as
+    # (text, kind, popularity) tuples
+    def search(self, query, limit=10):
+        prefixes = set(tokenize(query))
+        if not prefixes:
+            return []
+        ranges = {prefix: self._range(prefix) for prefix in prefixes}
+        best = min(prefixes, key=lambda prefix: ranges[prefix][1] - ranges[prefix][0])
+        candidates = self._candidates(best, *ranges[best])
+        for prefix in prefixes - {best}:
+            if not len(candidates):
+                break
+            candidates = candidates[self._has_token_in(candidates, *ranges[prefix])]
+        return [
+            (self.texts[entry], SEARCH_KINDS[self.kinds[entry]], int(self.popularity[entry]))
+            for entry in candidates[:limit].tolist()
+        ]
+
+
+def search_index_path(fingerprint):
+    digest = hashlib.sha1(
+        f"{fingerprint}:{_FORMAT}:{SEARCH_PREFIX_TOP}:{SEARCH_SCAN_LIMIT}".encode()
+    ).hexdigest()[:16]
+    return os.path.join(SEARCH_DIR, f"{digest}.npz")
+
+
+# The index stored for `fingerprint`, or one built from `entries()` and
+# stored. `entries` is a callable returning (texts, kinds, popularity), so the
+# data is only touched on a cache miss.
+def load_or_build(fingerprint, entries):
+    path = search_index_path(fingerprint)
+    if os.path.exists(path):
+        try:
+            return SearchIndex.load(path)
+        except (OSError, ValueError, KeyError):
+            logger.warning("Unreadable search index %s; rebuilding it", path)
+    index = SearchIndex.build(*entries())
+    index.save(path)
+    logger.info("Built a search index of %d entries", len(index))
+    return index
@@ -0,0 +1,195 @@
+# Compact serialization of figures returned by callbacks
+#
+# Callback outputs are compacted here and encoded once, by Dash, when the
+# response is sent (with Plotly's JSON encoder, orjson when installed). In
+# compacting, every numeric array in a trace is either rounded to
+# FIGURE_FLOAT_PRECISION decimals or, when it has at least
+# TYPED_ARRAY_MIN_LENGTH elements, replaced by a base64 typed-array spec
+# ({'dtype': ..., 'bdata': ...}) that plotly.js decodes natively. Response
+# sizes per callback are recorded before and after HTTP compression.
+
+import os
+import base64
+import threading
+
+import numpy as np
+from flask import request
+from plotly.basedatatypes import BaseFigure, BaseTraceType
+from dash.development.base_component import Component
+
+from instrumentation import span
+
+# Decimals kept for floats in figure data
+FIGURE_FLOAT_PRECISION = int(os.environ.get('FIGURE_FLOAT_PRECISION', 4))
+
+# Numeric arrays at least this long are sent as binary typed arrays (0 disables)
+TYPED_ARRAY_MIN_LENGTH = int(os.environ.get('TYPED_ARRAY_MIN_LENGTH', 64))
+
+# Integer dtypes plotly.js can decode, smallest first
+_INT_DTYPES = [np.int8, np.uint8, np.int16, np.uint16, np.int32, np.uint32]
+
+
+def _numeric_array(value):
+    if isinstance(value, np.ndarray):
+        array = value
+    elif isinstance(value, (list, tuple)) and value and all(
+        v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in value
+    ):
+        array = np.array([np.nan if v is None else v for v in value])
+    else:
+        return None
+    if array.ndim != 1 or array.dtype.kind not in 'iuf':
+        return None
+    return array
+
+
+def _typed_array(array):
+    if array.dtype.kind in 'iu':
+        low, high = (array.min(), array.max()) if len(array) else (0, 0)
+        for dtype in _INT_DTYPES:
+            info = np.iinfo(dtype)
+            if info.min <= low and high <= info.max:
+                array = array.astype(dtype)
+                break
+        else:
+            array = array.astype(np.float64)
+    else:
+        array = np.round(array, FIGURE_FLOAT_PRECISION)
+        # float32 is exact enough if the rounded values keep under 24 bits of mantissa
+        finite = array[np.isfinite(array)]
+        scale = np.abs(finite).max() * 10 ** FIGURE_FLOAT_PRECISION if len(finite) else 0
+        array = array.astype(np.float32 if scale < 2 ** 24 else np.float64)
+    return {
+        'dtype': f"{array.dtype.kind}{array.dtype.itemsize}",
+        'bdata': base64.b64encode(np.ascontiguousarray(array).tobytes()).decode('ascii'),
+    }
+
+
+def _compact_array(value):
+    array = _numeric_array(value)
+    if array is None:
+        return value
+    if TYPED_ARRAY_MIN_LENGTH and len(array) >= TYPED_ARRAY_MIN_LENGTH:
+        return _typed_array(array)
+    if array.dtype.kind == 'f':
+        return [None if np.isnan(v) else v for v in np.round(array, FIGURE_FLOAT_PRECISION).tolist()]
+    return value
+
+
+# Compact every numeric array of a trace (including nested ones such as marker.size)
+def compact_trace(trace):
+    if isinstance(trace, BaseTraceType):
+        trace = trace.to_plotly_json()
+    compacted = {}
+    for key, value in trace.items():
+        if isinstance(value, dict):
+            compacted[key] = compact_trace(value)
+        else:
+            compacted[key] = _compact_array(value)
+    return compacted
+
+
+def compact_figure(figure):
+    if isinstance(figure, BaseFigure):
+        figure = figure.to_plotly_json()
+    return dict(figure, data=[compact_trace(trace) for trace in figure.get('data', [])])
+
+
+def _is_figure_dict(value):
+    return isinstance(value, dict) and isinstance(value.get('data'), list) and 'layout' in value
+
+
+# Compact the figures found anywhere in a callback output: a figure, a
+# component tree containing dcc.Graph figures, or lists/dicts of those.
+# Numeric data outside figures (e.g. dcc.Store contents) is left untouched.
+def compact_output(value):
+    if isinstance(value, BaseFigure) or _is_figure_dict(value):
+        return compact_figure(value)
+    if isinstance(value, Component):
+        return {
+            'props': {
+                key: compact_output(prop)
+                for key, prop in value.to_plotly_json()['props'].items()
+            },
+            'type': value._type,
+            'namespace': value._namespace,
+        }
+    if isinstance(value, dict):
+        return {key: compact_output(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)) and value and isinstance(value[0], (dict, list, tuple, Component)):
+        return [compact_output(item) for item in value]
+    return value
+
+
+# Approximate size in bytes of the JSON encoding of `value`, without encoding it
+def json_size(value):
+    if isinstance(value, str):
+        return len(value) + 2
+    if isinstance(value, dict):
+        return 2 + sum(len(str(key)) + 4 + json_size(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return 2 + sum(json_size(item) + 1 for item in value)
+    if isinstance(value, np.ndarray):
+        return 2 + value.size * 8
+    return 8
+
+
+# Compact a callback output, ready for Dash to encode, and return it together
+# with its approximate JSON size in bytes
+def serialize_output(value):
+    with span('serialize'):
+        compacted = compact_output(value)
+        return compacted, json_size(compacted)
+
+
+# Per-callback response sizes: JSON bytes produced and bytes actually sent
+class PayloadStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, callback, raw_bytes, sent_bytes):
+        with self._lock:
+            stats = self._stats.setdefault(callback, {'requests': 0, 'raw_bytes': 0, 'sent_bytes': 0})
+            stats['requests'] += 1
+            stats['raw_bytes'] += raw_bytes
+            stats['sent_bytes'] += sent_bytes
+
+    def snapshot(self):
+        with self._lock:
+            return {callback: dict(stats) for callback, stats in self._stats.items()}
+
+
+payload_stats = PayloadStats()
+
+
+def _callback_name():
+    if not request.path.endswith('_dash-update-component'):
+        return None
+    body = request.get_json(silent=True) or {}
+    return body.get('output')
+
+
+# Record response sizes of Dash callbacks on `server`, and enable Brotli/gzip
+# compression of responses. Must be called after the Dash app is created,
+# since Dash registers its compression hook on construction.
+def install_payload_tracking(server, algorithms=('br', 'gzip')):
+    server.config['COMPRESS_ALGORITHM'] = list(algorithms)
+    server.config.setdefault('COMPRESS_BR_LEVEL', 4)
+
+    # Runs before compression: size of the JSON produced
+    @server.after_request
+    def measure_raw_payload(response):
+        if _callback_name() is not None and not response.direct_passthrough:
+            response.raw_payload_bytes = response.content_length or len(response.get_data())
+        return response
+
+    # Registered first so it runs last, after compression: size actually sent
+    def measure_sent_payload(response):
+        callback = _callback_name()
+        raw_bytes = getattr(response, 'raw_payload_bytes', None)
+        if callback is not None and raw_bytes is not None:
+            payload_stats.record(callback, raw_bytes, response.content_length or raw_bytes)
+        return response
+
+    server.after_request_funcs.setdefault(None, []).insert(0, measure_sent_payload)
@@ -0,0 +1,73 @@
+# Production server for the dashboard
+#
+# Runs the Dash app under gunicorn with several worker processes. The app and
+# all of its data are loaded once in the master process (preload_app) before
+# workers are forked, so workers share the datasets, indexes and cached
+# layouts copy-on-write instead of each loading their own copies. Dash debug
+# tooling (dev tools, hot reload) is never enabled here.
+#
+#   python serve.py --workers 4 --bind 0.0.0.0:8050
+
+import os
+import argparse
+import gc
+import logging
+import multiprocessing
+
+from gunicorn.app.base import BaseApplication
+
+
+class DashboardServer(BaseApplication):
+    def __init__(self, options):
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        from app import create_app
+
+        server = create_app().server
+        # Keep the garbage collector from touching (and so copying) the
+        # preloaded objects in every forked worker
+        gc.freeze()
+        return server
+
+
+# Start the background layout computation from the workers, not the master,
+# so that no worker inherits the master's pool processes
+def post_worker_init(worker):
+    from app import COLLABORATION_FILTERING, ensure_collaboration_layout
+
+    if COLLABORATION_FILTERING == 'server':
+        ensure_collaboration_layout()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the Spotify dashboard with gunicorn.")
+    parser.add_argument('--bind', default='0.0.0.0:8050', help="Address to listen on")
+    parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count(),
+                        help="Number of worker processes")
+    parser.add_argument('--threads', type=int, default=4, help="Threads per worker")
+    parser.add_argument('--timeout', type=int, default=60, help="Worker timeout in seconds")
+    args = parser.parse_args()
+    # Startup reports (e.g. the memory each dataset holds) are logged at INFO
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+    # The superseding callbacks' pool (callback_pool.py) matches the request threads
+    os.environ['GUNICORN_THREADS'] = str(args.threads)
+
+    DashboardServer({
+        'bind': args.bind,
+        'workers': args.workers,
+        'threads': args.threads,
+        'timeout': args.timeout,
+        'preload_app': True,
+        'accesslog': '-',
+        'post_worker_init': post_worker_init,
+    }).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+# Chunked readers for dataset files, plain or inside zip archives
+#
+# Members are decompressed as they are read, straight out of the archive, and
+# parsed into DataFrames of at most `chunk_rows` rows, so memory stays bounded
+# by the chunk size no matter how large the file is. CSVs are parsed with
+# pandas' chunked reader. Excel sheets are read row by row with openpyxl's
+# read-only mode; a zipped workbook is first copied out of its archive to a
+# temporary file, in fixed-size blocks, since openpyxl needs a seekable file.
+#
+# Column names are normalized with COLUMN_ALIASES, so sources that name the
+# same fields differently (e.g. the artificial catalog's song_title/artist)
+# produce the dashboard's column names.
+
+import os
+import shutil
+import zipfile
+import tempfile
+
+import pandas as pd
+
+# Rows per chunk
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 100_000))
+
+# Source column name -> dashboard column name
+COLUMN_ALIASES = {
+    'song_title': 'name',
+    'artist': 'artists',
+}
+
+_COPY_BLOCK_BYTES = 2 ** 20
+
+
+def _canonical(column):
+    return COLUMN_ALIASES.get(column, column)
+
+
+def _iter_csv(fileobj, columns, dtype, chunk_rows):
+    # dtype is given with dashboard names; pandas needs the source names too
+    dtype = dict(dtype or {})
+    dtype.update({source: dtype[name] for source, name in COLUMN_ALIASES.items() if name in dtype})
+    usecols = (lambda column: _canonical(column) in columns) if columns else None
+    with pd.read_csv(fileobj, usecols=usecols, dtype=dtype or None, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            yield chunk.rename(columns=_canonical)
+
+
+def _iter_xlsx(path, columns, dtype, chunk_rows):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = [_canonical(column) for column in next(rows, ())]
+        keep = [i for i, column in enumerate(header) if not columns or column in columns]
+        names = [header[i] for i in keep]
+
+        def to_frame(batch):
+            frame = pd.DataFrame(batch, columns=names)
+            return frame.astype(dtype) if dtype else frame
+
+        batch = []
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in keep])
+            if len(batch) == chunk_rows:
+                yield to_frame(batch)
+                batch = []
+        if batch:
+            yield to_frame(batch)
+    finally:
+        workbook.close()
+
+
+def _is_excel(name):
+    return name.endswith(('.xlsx', '.xlsm'))
+
+
+# The data member of an archive: `member` if given, else the first CSV or
+# Excel file in it
+def archive_member(archive, member=None):
+    if member is not None:
+        return member
+    with zipfile.ZipFile(archive) as zf:
+        for name in zf.namelist():
+            if name.endswith('.csv') or _is_excel(name):
+                return name
+    raise ValueError(f"No CSV or Excel file in {archive}")
+
+
+# Yield DataFrame chunks of a dataset file, or of `member` inside the zip
+# archive `path`, keeping only `columns` (dashboard names) when given
+def iter_chunks(path, member=None, columns=None, dtype=None, chunk_rows=STREAM_CHUNK_ROWS):
+    if not path.endswith('.zip'):
+        if _is_excel(path):
+            yield from _iter_xlsx(path, columns, dtype, chunk_rows)
+        else:
+            yield from _iter_csv(path, columns, dtype, chunk_rows)
+        return
+
+    member = archive_member(path, member)
+    with zipfile.ZipFile(path) as zf:
+        if not _is_excel(member):
+            with zf.open(member) as fileobj:
+                yield from _iter_csv(fileobj, columns, dtype, chunk_rows)
+            return
+
+        with tempfile.NamedTemporaryFile(suffix=os.path.splitext(member)[1]) as tmp:
+            with zf.open(member) as fileobj:
+                shutil.copyfileobj(fileobj, tmp, _COPY_BLOCK_BYTES)
+            tmp.flush()
+            yield from _iter_xlsx(tmp.name, columns, dtype, chunk_rows)
+
+
+# Read a whole archive member into one DataFrame, for datasets small enough
+# to be held in memory, keeping only `columns` (dashboard names) when given
+def read_member(archive, member=None, columns=None):
+    member = archive_member(archive, member)
+    usecols = (lambda column: _canonical(column) in columns) if columns else None
+    with zipfile.ZipFile(archive) as zf, zf.open(member) as fileobj:
+        if _is_excel(member):
+            frame = pd.read_excel(fileobj, usecols=usecols)
+        else:
+            frame = pd.read_csv(fileobj, usecols=usecols)
+    return frame.rename(columns=_canonical)
@@ -0,0 +1,62 @@
+import time
+import threading
+
+from callback_pool import CallbackPool, Superseded, checkpoint
+
+
+def test_superseded_request_returns_before_its_callback_finishes():
+    pool = CallbackPool(workers=2)
+    started, release = threading.Event(), threading.Event()
+    outcome = {}
+
+    def slow():
+        started.set()
+        release.wait(5)
+        checkpoint()
+        return 'old'
+
+    def first():
+        start = time.perf_counter()
+        try:
+            outcome['first'] = pool.run('key', slow)
+        except Superseded:
+            outcome['first'] = Superseded
+        outcome['waited'] = time.perf_counter() - start
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    assert started.wait(5)
+    assert pool.run('key', lambda: 'new') == 'new'
+    thread.join(5)
+    assert outcome['first'] is Superseded
+    assert outcome['waited'] < 1
+    release.set()
+
+
+def test_queued_request_is_cancelled():
+    pool = CallbackPool(workers=1)
+    release = threading.Event()
+    ran = []
+    blocker = threading.Thread(target=pool.run, args=('other', release.wait, 5))
+    blocker.start()
+    time.sleep(0.05)
+
+    results = {}
+
+    def first():
+        try:
+            results['first'] = pool.run('key', ran.append, 'old')
+        except Superseded:
+            results['first'] = Superseded
+
+    thread = threading.Thread(target=first)
+    thread.start()
+    time.sleep(0.05)
+    second = threading.Thread(target=lambda: results.setdefault('second', pool.run('key', ran.append, 'new')))
+    second.start()
+    thread.join(5)
+    assert results['first'] is Superseded
+    release.set()
+    second.join(5)
+    blocker.join(5)
+    assert ran == ['new']
@@ -0,0 +1,23 @@
+import itertools
+
+from collaboration import CSRGraph
+
+
+# Two 5-cliques joined by a single edge between nodes 0 and 5
+def two_cliques():
+    edges = [pair for clique in (range(5), range(5, 10)) for pair in itertools.combinations(clique, 2)]
+    edges.append((0, 5))
+    sources, targets = zip(*edges)
+    return CSRGraph(10, sources, targets)
+
+
+def test_communities_of_two_joined_cliques():
+    communities = two_cliques().communities()
+    assert len(set(communities[:5])) == 1
+    assert len(set(communities[5:])) == 1
+    assert communities[0] != communities[5]
+
+
+def test_communities_are_seeded():
+    graph = two_cliques()
+    assert graph.communities(seed=3).tolist() == graph.communities(seed=3).tolist()
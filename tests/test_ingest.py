@@ -0,0 +1,21 @@
+import ingest
+from ingest import CatalogIngestor, complete_records
+
+
+def test_complete_records_skip_quoted_newlines():
+    assert complete_records(b'a,"b\nc"\nd,"e\n') == len(b'a,"b\nc"\n')
+    assert complete_records(b'a,"b ""x""\nc"') == 0
+
+
+def test_quoted_newlines_across_blocks_and_appends(tmp_path, monkeypatch):
+    monkeypatch.setattr(ingest, 'INGEST_BLOCK_BYTES', 7)
+    path = tmp_path / 'catalog.csv'
+    path.write_text('name,genre,artists,popularity\n"Two\nLines",pop,"A, ""B""",50\nSolo,rock,C,40\n"Half')
+    ingestor = CatalogIngestor(str(path))
+    ingestor.refresh()
+    assert ingestor.title_map() == {'Two\nLines': 50, 'Solo': 40}
+
+    with open(path, 'a') as f:
+        f.write(' done\nx",pop,D,10\n')
+    ingestor.refresh()
+    assert ingestor.title_map() == {'Two\nLines': 50, 'Solo': 40, 'Half done\nx': 10}
@@ -0,0 +1,83 @@
+# Word cloud images rendered straight from WordCloud/PIL and cached on disk
+#
+# The word layout is computed once per data hash and rendered at every size in
+# WORDCLOUD_SIZES (WordCloud's `scale` re-renders the same layout at a higher
+# resolution) and in every format in WORDCLOUD_FORMATS. Files are written under
+# CACHE_DIR/wordcloud/<data hash>/, so they survive restarts and are shared by
+# all worker processes.
+
+import os
+import shutil
+import threading
+
+from wordcloud import WordCloud
+
+from data_store import CACHE_DIR
+
+WORDCLOUD_DIR = os.path.join(CACHE_DIR, 'wordcloud')
+
+# Layout size in pixels; the other sizes are rendered from the same layout
+WORDCLOUD_BASE_SIZE = 800
+WORDCLOUD_SIZES = (400, 800, 1600)
+WORDCLOUD_FORMATS = {
+    'webp': 'image/webp',
+    'png': 'image/png',
+}
+
+_lock = threading.Lock()
+
+
+def wordcloud_dir(data_hash):
+    return os.path.join(WORDCLOUD_DIR, data_hash)
+
+
+def wordcloud_path(data_hash, size, fmt):
+    return os.path.abspath(os.path.join(wordcloud_dir(data_hash), f"{size}.{fmt}"))
+
+
+def generate_wordcloud(frequencies):
+    return WordCloud(
+        width=WORDCLOUD_BASE_SIZE,
+        height=WORDCLOUD_BASE_SIZE,
+        background_color="#191414",  # Spotify Black
+        colormap="Greens",  # Spotify Green theme
+        contour_color="#1db954",  # Spotify Green contour
+        contour_width=2,
+        max_words=200,
+        prefer_horizontal=0.8
+    ).generate_from_frequencies(frequencies)
+
+
+# Render every size/format for `data_hash` unless already on disk.
+# `frequencies` is a callable so the data is only touched on a cache miss.
+def ensure_wordcloud(data_hash, frequencies):
+    target = wordcloud_dir(data_hash)
+    if os.path.isdir(target):
+        return target
+
+    with _lock:
+        if os.path.isdir(target):
+            return target
+
+        wordcloud = generate_wordcloud(frequencies())
+
+        # Render into a temporary directory and rename it into place, so other
+        # processes never serve a partially written set of images
+        tmp_dir = f"{target}.{os.getpid()}.tmp"
+        os.makedirs(tmp_dir, exist_ok=True)
+        for size in WORDCLOUD_SIZES:
+            wordcloud.scale = size / WORDCLOUD_BASE_SIZE
+            image = wordcloud.to_image()
+            for fmt in WORDCLOUD_FORMATS:
+                image.save(os.path.join(tmp_dir, f"{size}.{fmt}"), format=fmt.upper(), optimize=True)
+        try:
+            os.rename(tmp_dir, target)
+        except OSError:
+            # Another process finished first
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+        # Drop images rendered for older versions of the data
+        for entry in os.listdir(WORDCLOUD_DIR):
+            if entry != data_hash and not entry.endswith('.tmp'):
+                shutil.rmtree(os.path.join(WORDCLOUD_DIR, entry), ignore_errors=True)
+        return target